@@ -0,0 +1,200 @@
+"""Per-frame allocation report for the game loop, with a budget check.
+
+Runs the world headless (SDL dummy driver) with a scripted player and measures
+every phase of a frame with tracemalloc:
+
+    python alloc_budget.py                 # level 1, 600 measured frames
+    python alloc_budget.py --level 3 --frames 1200 --budget-bytes 512
+
+For each phase it reports the bytes allocated on top of what was live when the
+phase started (tracemalloc peak) and the net number of memory blocks the phase
+left behind. Some transient bytes are expected: pygame returns Rect coordinates
+and Python does arithmetic with int objects, and ints above 256 are allocated
+(and freed right away). Those are not tracked by the garbage collector. The
+numbers that matter for GC pauses are the net blocks and the collection count.
+
+Frames that load a level are not counted. The exit code is 1 when
+the steady-state loop goes over the budget or the garbage collector ran while
+measuring, so this can guard against per-frame allocations creeping back in.
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from world import WIDTH, HEIGHT, World, build_level, IN_RIGHT, IN_JUMP, IN_FLOAT, IN_RESTART
+from systems import step, render_system
+from render_batch import Renderer, Hud, load_image
+from telemetry import TelemetryWriter
+
+PHASES = ('physics', 'machines', 'hazards', 'effects', 'render', 'hud', 'telemetry')
+
+
+def bot_input(world):
+    """Scripted player: run right, jump regularly, float a bit, restart when the run ends."""
+    f = world.frame
+    bits = IN_RIGHT
+    if f % 45 < 3:
+        bits |= IN_JUMP
+    if f % 45 > 20 and f % 45 < 30:
+        bits |= IN_FLOAT
+    if world.game_over or world.win:
+        bits |= IN_RESTART
+    return bits
+
+
+class AllocProbe:
+    """Collects tracemalloc measurements per phase (used as the `probe` of systems.step)."""
+
+    def __init__(self):
+        self.active = False
+        self.frames = 0
+        self.peak = {name: 0 for name in PHASES}
+        self.max_peak = {name: 0 for name in PHASES}
+        self.blocks = {name: 0 for name in PHASES}
+        self._frame_peak = {name: 0 for name in PHASES}
+        self._frame_blocks = {name: 0 for name in PHASES}
+        self._start = 0
+        self._start_blocks = 0
+        # what begin()/end() themselves allocate, measured on an empty phase
+        self.overhead = 0
+        self.overhead_blocks = 0
+
+    def begin(self, name):
+        tracemalloc.reset_peak()
+        self._start = tracemalloc.get_traced_memory()[0]
+        self._start_blocks = sys.getallocatedblocks()
+
+    def end(self, name):
+        peak = tracemalloc.get_traced_memory()[1] - self._start
+        blocks = sys.getallocatedblocks() - self._start_blocks
+        self._frame_peak[name] = max(0, peak - self.overhead)
+        self._frame_blocks[name] = blocks - self.overhead_blocks
+
+    def calibrate(self):
+        """Measure an empty phase; its cost is what begin()/end() allocate themselves."""
+        self.overhead = 0
+        self.overhead_blocks = 0
+        self.begin('idle')
+        self.end('idle')
+        self.overhead = self._frame_peak.pop('idle')
+        self.overhead_blocks = self._frame_blocks.pop('idle')
+
+    def begin_frame(self):
+        for name in PHASES:
+            self._frame_peak[name] = 0
+            self._frame_blocks[name] = 0
+
+    def end_frame(self, keep):
+        if not (keep and self.active):
+            return
+        self.frames += 1
+        for name in PHASES:
+            self.peak[name] += self._frame_peak[name]
+            self.blocks[name] += self._frame_blocks[name]
+            self.max_peak[name] = max(self.max_peak[name], self._frame_peak[name])
+
+    def per_frame(self, totals, name):
+        return totals[name] / self.frames if self.frames else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--level', type=int, default=1)
+    parser.add_argument('--frames', type=int, default=600, help='measured frames')
+    parser.add_argument('--warmup', type=int, default=300, help='frames before measuring (pools and sprite caches fill up)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--images', action='store_true', help='load the png/jpg sprites instead of the fallbacks')
+    parser.add_argument('--telemetry', metavar='FILE', help='also write telemetry records to this file and measure that')
+    parser.add_argument('--budget-bytes', type=int, default=1024, help='max mean allocated bytes per frame')
+    parser.add_argument('--budget-blocks', type=float, default=0.5, help='max mean net new blocks per frame')
+    args = parser.parse_args(argv)
+
+    pygame.init()
+    screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    if args.images:
+        renderer = Renderer(load_image('Kip.png', (48, 48)), load_image('Mayonnaise_Machine.png', (48, 48)),
+                            load_image('achtergrond 3.jpg', (WIDTH, HEIGHT)))
+    else:
+        renderer = Renderer()
+    hud = Hud(pygame.font.SysFont(None, 36), pygame.font.SysFont(None, 64), renderer.hud_layer, (WIDTH, HEIGHT))
+    world = World(seed=args.seed)
+    build_level(world, args.level)
+    telemetry = TelemetryWriter(args.telemetry) if args.telemetry else None
+
+    probe = AllocProbe()
+    collections = [0]
+
+    def on_gc(phase, info):
+        if phase == 'start' and probe.active:
+            collections[0] += 1
+
+    gc.callbacks.append(on_gc)
+    tracemalloc.start()
+    load_frames = 0
+    try:
+        for f in range(args.warmup + args.frames):
+            probe.active = f >= args.warmup
+            level, terrain = world.level, world.terrain
+            bits = bot_input(world)
+            probe.begin_frame()
+            probe.calibrate()
+            step(world, bits, 16, probe)
+            probe.begin('render')
+            render_system(world, screen, renderer)
+            probe.end('render')
+            probe.begin('hud')
+            hud.draw(screen, world)
+            probe.end('hud')
+            if telemetry is not None:
+                probe.begin('telemetry')
+                telemetry.write(world, 16, 5)
+                probe.end('telemetry')
+            # a level (re)load rebuilds the world; that is not steady state
+            loaded = world.level != level or world.terrain is not terrain
+            if loaded and probe.active:
+                load_frames += 1
+            probe.end_frame(not loaded)
+    finally:
+        tracemalloc.stop()
+        gc.callbacks.remove(on_gc)
+        if telemetry is not None:
+            telemetry.close()
+
+    print(f"level {args.level}: {probe.frames} frames measured, {load_frames} level-load frames skipped")
+    print(f"{'phase':<10} {'bytes/frame':>12} {'max bytes':>10} {'blocks/frame':>13}")
+    total_bytes = 0.0
+    total_blocks = 0.0
+    for name in PHASES:
+        b = probe.per_frame(probe.peak, name)
+        n = probe.per_frame(probe.blocks, name)
+        total_bytes += b
+        total_blocks += n
+        print(f"{name:<10} {b:>12.1f} {probe.max_peak[name]:>10} {n:>13.2f}")
+    print(f"{'total':<10} {total_bytes:>12.1f} {'':>10} {total_blocks:>13.2f}")
+    print(f"gc collections while measuring: {collections[0]}")
+
+    ok = True
+    if total_bytes > args.budget_bytes:
+        print(f"FAIL: {total_bytes:.1f} bytes/frame is over the budget of {args.budget_bytes}")
+        ok = False
+    if total_blocks > args.budget_blocks:
+        print(f"FAIL: {total_blocks:.2f} new blocks/frame is over the budget of {args.budget_blocks}")
+        ok = False
+    if collections[0]:
+        print("FAIL: the garbage collector ran during the steady-state loop")
+        ok = False
+    if ok:
+        print("OK: within the per-frame allocation budget")
+    pygame.quit()
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
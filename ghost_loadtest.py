@@ -0,0 +1,137 @@
+"""Load test for ghost racing: hundreds of ghosts at 60 Hz against a local server.
+
+Starts a GhostServer on localhost, connects `--bots` simulated players that
+each stream their position at 60 Hz, and watches them through a real
+GhostClient like the game uses:
+
+    python ghost_loadtest.py --bots 300 --seconds 10
+
+It reports how many ghosts the watching client sees, how often each ghost
+was updated, the traffic per client and how long interpolating all ghosts
+for one frame takes on the game thread.
+"""
+import argparse
+import asyncio
+import math
+import sys
+import threading
+import time
+
+from ghosts import GhostServer, GhostClient, Encoder, TICK_HZ, now_ms
+
+
+async def bot(host, port, index, stop, counters):
+    """One simulated player: runs back and forth on level 1 and jumps now and then."""
+    reader, writer = await asyncio.open_connection(host, port)
+    encoder = Encoder()
+    out = bytearray()
+
+    async def drain_incoming():
+        # bots don't look at the ghosts, but the server's stream has to be read
+        while True:
+            data = await reader.read(1 << 16)
+            if not data:
+                return
+            counters['bot_bytes_in'] += len(data)
+
+    reading = asyncio.create_task(drain_incoming())
+    period = 1.0 / TICK_HZ
+    next_send = time.monotonic() + (index % TICK_HZ) * period / TICK_HZ
+    phase = index * 0.37
+    try:
+        while not stop.is_set():
+            next_send += period
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            t = time.monotonic() + phase
+            x = int(1500 + 1400 * math.sin(t * 0.5))
+            y = int(402 - abs(120 * math.sin(t * 3.0)))
+            encoder.encode(x, y, 1, 2, out)
+            writer.write(out)
+            out.clear()
+            counters['sent'] += 1
+    finally:
+        reading.cancel()
+        writer.close()
+
+
+async def run(args):
+    server = GhostServer()
+    port = await server.start('127.0.0.1', 0)
+    watcher = GhostClient('127.0.0.1', port).start()
+    # the watcher also publishes a state, like a game would
+    watcher.publish(50, 402, 1, 0)
+
+    stop = asyncio.Event()
+    counters = {'sent': 0, 'bot_bytes_in': 0}
+    bots = []
+    for i in range(args.bots):
+        bots.append(asyncio.create_task(bot('127.0.0.1', port, i, stop, counters)))
+        if i % 50 == 49:
+            await asyncio.sleep(0.05)
+
+    # give everyone time to connect and get keyframed
+    await asyncio.sleep(1.0)
+    start_packets = watcher.packets_in
+    start_bytes = watcher.bytes_in
+    start_ticks = server.ticks
+    start_sent = counters['sent']
+    t0 = time.monotonic()
+
+    frame_ms = []
+    seen = []
+    done = threading.Event()
+
+    def game_thread():
+        # what the game loop does every frame: publish, interpolate, at 60 FPS
+        next_frame = time.perf_counter()
+        while not done.is_set():
+            watcher.publish(50, 402, 1, 0)
+            t = time.perf_counter()
+            n = watcher.update_view(1, now_ms())
+            frame_ms.append((time.perf_counter() - t) * 1000.0)
+            seen.append(n)
+            next_frame += 1.0 / 60
+            time.sleep(max(0.0, next_frame - time.perf_counter()))
+
+    game = threading.Thread(target=game_thread, daemon=True)
+    game.start()
+    await asyncio.sleep(args.seconds)
+    done.set()
+    elapsed = time.monotonic() - t0
+    game.join()
+
+    packets = watcher.packets_in - start_packets
+    ghosts = max(1, watcher.count)
+    frame_ms.sort()
+    stop.set()
+    await asyncio.gather(*bots, return_exceptions=True)
+    watcher.stop()
+    await server.close()
+
+    print(f"bots: {args.bots}, measured for {elapsed:.1f} s")
+    print(f"server ticks: {(server.ticks - start_ticks) / elapsed:.1f} Hz, "
+          f"bots sent {(counters['sent'] - start_sent) / elapsed / max(1, args.bots):.1f} Hz each")
+    print(f"ghosts visible to the watching client: {watcher.count} (min {min(seen)} over {len(seen)} frames)")
+    print(f"updates per ghost at the client: {packets / elapsed / ghosts:.1f} Hz")
+    print(f"client traffic: {(watcher.bytes_in - start_bytes) / elapsed / 1024:.1f} KiB/s "
+          f"({(watcher.bytes_in - start_bytes) / max(1, packets):.1f} bytes per update)")
+    print(f"update_view on the game thread: median {frame_ms[len(frame_ms) // 2]:.3f} ms, "
+          f"p99 {frame_ms[int(len(frame_ms) * 0.99)]:.3f} ms")
+    ok = watcher.count >= args.bots and packets / elapsed / ghosts >= args.min_hz
+    print("OK" if ok else "FAIL: not all ghosts were seen at the target rate")
+    return 0 if ok else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--bots', type=int, default=300)
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--min-hz', type=float, default=55.0, help='required update rate per ghost')
+    args = parser.parse_args(argv)
+    return asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    sys.exit(main())
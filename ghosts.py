@@ -0,0 +1,558 @@
+"""Ghost racing: see other players on the same level as see-through chickens.
+
+A small asyncio server relays player positions and key bits between games on
+localhost or a LAN. Games connect with GhostClient, which runs its own event
+loop in a background thread, so the game loop never waits on the network:
+it only hands over its latest position and reads interpolated ghost positions.
+
+    python ghosts.py --host 0.0.0.0 --port 8765     # run a server
+    python Real.py --ghost 192.168.1.10:8765        # race against it
+
+Packets are fixed-size and little-endian. A keyframe carries the absolute
+position, a delta only the movement since the previous packet of that
+player (one byte per axis). The server batches everything it received
+during a tick and sends that to every client in one write.
+"""
+import argparse
+import asyncio
+import struct
+import threading
+import time
+from array import array
+
+DEFAULT_PORT = 8765
+TICK_HZ = 60
+# keyframe every 2 seconds even if deltas would do, so a corrupted state heals
+KEYFRAME_EVERY = 120
+# ghosts are drawn this far in the past so there are two updates to interpolate between
+INTERP_MS = 100
+# clients send one seq number per tick, so seq is the sender's clock
+SEQ_MS = 1000.0 / TICK_HZ
+# how fast a ghost's clock offset follows packets that arrive later than expected
+OFFSET_FOLLOW = 0.02
+# ghosts that sent nothing for this long are hidden
+GHOST_TIMEOUT_MS = 5000
+# snapshots kept per ghost for interpolation
+HISTORY = 8
+MAX_GHOSTS = 1024
+# a client that has this much unsent data is skipped and resynced with keyframes later
+SLOW_CLIENT_BYTES = 256 * 1024
+
+# packet kinds
+KEYFRAME = 1
+DELTA = 2
+LEAVE = 3
+WELCOME = 4
+
+# kind, keys, ghost id, seq, level, x, y
+KEY_PACKET = struct.Struct('<BBHHBxii')
+# kind, keys, ghost id, seq, dx, dy
+DELTA_PACKET = struct.Struct('<BBHHbb')
+# kind, unused, ghost id, unused
+ID_PACKET = struct.Struct('<BBHHxx')
+PACKET_SIZES = {KEYFRAME: KEY_PACKET.size, DELTA: DELTA_PACKET.size,
+                LEAVE: ID_PACKET.size, WELCOME: ID_PACKET.size}
+
+
+def now_ms():
+    return time.monotonic() * 1000.0
+
+
+class Decoder:
+    """Splits a byte stream into packets, keeping partial packets for the next read."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data, on_packet):
+        """Decode all whole packets; calls on_packet(kind, ghost_id, keys, seq, level, a, b).
+
+        For keyframes (a, b) is the position, for deltas it is the movement and
+        level is -1. LEAVE and WELCOME only carry the ghost id.
+        """
+        buf = self.buffer
+        buf += data
+        off = 0
+        end = len(buf)
+        while off < end:
+            kind = buf[off]
+            size = PACKET_SIZES.get(kind)
+            if size is None:
+                # garbage in the stream; drop the rest rather than misparse it
+                off = end
+                break
+            if off + size > end:
+                break
+            if kind == KEYFRAME:
+                _, keys, gid, seq, level, x, y = KEY_PACKET.unpack_from(buf, off)
+                on_packet(kind, gid, keys, seq, level, x, y)
+            elif kind == DELTA:
+                _, keys, gid, seq, dx, dy = DELTA_PACKET.unpack_from(buf, off)
+                on_packet(kind, gid, keys, seq, -1, dx, dy)
+            else:
+                _, _, gid, _ = ID_PACKET.unpack_from(buf, off)
+                on_packet(kind, gid, 0, 0, -1, 0, 0)
+            off += size
+        del buf[:off]
+
+
+class Encoder:
+    """Turns one player's positions into keyframe / delta packets."""
+
+    def __init__(self, ghost_id=0):
+        self.ghost_id = ghost_id
+        self.seq = 0
+        self.last = None
+        self.since_key = 0
+
+    def encode(self, x, y, level, keys, out):
+        """Append the packet for this state to bytearray `out`."""
+        self.seq = (self.seq + 1) & 0xFFFF
+        last = self.last
+        if last is not None and last[2] == level and self.since_key < KEYFRAME_EVERY:
+            dx = x - last[0]
+            dy = y - last[1]
+            if -128 <= dx <= 127 and -128 <= dy <= 127:
+                out += DELTA_PACKET.pack(DELTA, keys, self.ghost_id, self.seq, dx, dy)
+                self.last = (x, y, level)
+                self.since_key += 1
+                return
+        out += KEY_PACKET.pack(KEYFRAME, keys, self.ghost_id, self.seq, level, x, y)
+        self.last = (x, y, level)
+        self.since_key = 0
+
+    def skip(self):
+        """A tick with nothing new to send; receivers time packets by seq, so it still counts."""
+        self.seq = (self.seq + 1) & 0xFFFF
+
+    def force_keyframe(self):
+        self.last = None
+
+
+# --- SERVER ---
+class GhostServer:
+    """Relays player states. Everything received in a tick goes out to all clients as one write."""
+
+    def __init__(self, tick_hz=TICK_HZ):
+        self.tick_hz = tick_hz
+        self.clients = {}
+        self.pending = set()
+        self.resync = set()
+        self.states = {}
+        self.tick_buffer = bytearray()
+        self.next_id = 1
+        self.server = None
+        self.handlers = set()
+        self.ticks = 0
+        self.packets_in = 0
+        self.bytes_out = 0
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT):
+        self.server = await asyncio.start_server(self._handle, host, port)
+        self._ticker_task = asyncio.create_task(self._ticker())
+        return self.server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        self._ticker_task.cancel()
+        self.server.close()
+        for writer in list(self.clients.values()):
+            writer.close()
+        # let the connection handlers see the closed sockets and clean up
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await self.server.wait_closed()
+
+    def _new_id(self):
+        while self.next_id in self.clients or self.next_id == 0:
+            self.next_id = (self.next_id + 1) & 0xFFFF
+        gid = self.next_id
+        self.next_id = (self.next_id + 1) & 0xFFFF
+        return gid
+
+    async def _handle(self, reader, writer):
+        if len(self.clients) >= MAX_GHOSTS:
+            writer.close()
+            return
+        gid = self._new_id()
+        self.clients[gid] = writer
+        # new clients get keyframes of everyone at the next tick, then the normal stream
+        self.pending.add(gid)
+        writer.write(ID_PACKET.pack(WELCOME, 0, gid, 0))
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        decoder = Decoder()
+        tick_buffer = self.tick_buffer
+        states = self.states
+
+        def on_packet(kind, _, keys, seq, level, a, b):
+            # clients cannot speak for other ghosts: their packets always get their own id
+            if kind == KEYFRAME:
+                states[gid] = [a, b, level, keys, seq]
+                tick_buffer.extend(KEY_PACKET.pack(KEYFRAME, keys, gid, seq, level, a, b))
+            elif kind == DELTA:
+                state = states.get(gid)
+                if state is None:
+                    return
+                state[0] += a
+                state[1] += b
+                state[3] = keys
+                state[4] = seq
+                tick_buffer.extend(DELTA_PACKET.pack(DELTA, keys, gid, seq, a, b))
+            else:
+                return
+            self.packets_in += 1
+
+        try:
+            while True:
+                data = await reader.read(65536)
+                if not data:
+                    break
+                decoder.feed(data, on_packet)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.pop(gid, None)
+            self.pending.discard(gid)
+            self.resync.discard(gid)
+            if states.pop(gid, None) is not None:
+                tick_buffer.extend(ID_PACKET.pack(LEAVE, 0, gid, 0))
+            self.handlers.discard(task)
+            writer.close()
+
+    def snapshot(self):
+        """Keyframes for every known ghost (for clients that join or fell behind)."""
+        out = bytearray()
+        for gid, s in self.states.items():
+            out += KEY_PACKET.pack(KEYFRAME, s[3], gid, s[4], s[2], s[0], s[1])
+        return bytes(out)
+
+    async def _ticker(self):
+        period = 1.0 / self.tick_hz
+        next_tick = time.monotonic()
+        while True:
+            next_tick += period
+            delay = next_tick - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                # running behind: don't try to catch up with a burst of ticks
+                next_tick = time.monotonic()
+            self.tick()
+
+    def tick(self):
+        self.ticks += 1
+        data = bytes(self.tick_buffer)
+        self.tick_buffer.clear()
+        snapshot = None
+        for gid, writer in self.clients.items():
+            if gid in self.pending or gid in self.resync:
+                continue
+            if writer.transport.get_write_buffer_size() > SLOW_CLIENT_BYTES:
+                # can't drop deltas, so stop sending and resync this client once it has caught up
+                self.resync.add(gid)
+                continue
+            if data:
+                writer.write(data)
+                self.bytes_out += len(data)
+        for gid in list(self.pending) + [g for g in self.resync
+                                         if self.clients[g].transport.get_write_buffer_size() < SLOW_CLIENT_BYTES // 4]:
+            if snapshot is None:
+                snapshot = self.snapshot()
+            writer = self.clients[gid]
+            # restarting the stream: forget deltas the client may have half-applied
+            writer.write(snapshot)
+            self.bytes_out += len(snapshot)
+            self.pending.discard(gid)
+            self.resync.discard(gid)
+
+
+# --- CLIENT ---
+class Ghost:
+    """Receive history of one remote player (written by the network thread)."""
+    __slots__ = ('t', 'x', 'y', 'head', 'count', 'level', 'keys', 'last_seen', 'cur_x', 'cur_y',
+                 'seq', 'seq_t', 'offset')
+
+    def __init__(self):
+        self.t = array('d', bytes(8 * HISTORY))
+        self.x = array('d', bytes(8 * HISTORY))
+        self.y = array('d', bytes(8 * HISTORY))
+        self.head = 0
+        self.count = 0
+        self.level = 0
+        self.keys = 0
+        self.last_seen = 0.0
+        # absolute position the deltas are applied to
+        self.cur_x = 0
+        self.cur_y = 0
+        # sender time of the newest packet (from seq) and local time minus sender time
+        self.seq = 0
+        self.seq_t = 0.0
+        self.offset = 0.0
+
+    def stamp(self, seq, now):
+        """Sender time (ms) of packet `seq` that arrived at local time `now`.
+
+        Packets that arrive together (several server ticks in one read) still
+        get their own send times. The offset to local time follows the
+        quickest arrivals and drifts up slowly when packets come in later.
+        """
+        if self.count == 0:
+            self.seq_t = 0.0
+            self.offset = now
+        else:
+            self.seq_t += ((seq - self.seq) & 0xFFFF) * SEQ_MS
+        self.seq = seq
+        delay = now - self.seq_t
+        if delay < self.offset:
+            self.offset = delay
+        else:
+            self.offset += (delay - self.offset) * OFFSET_FOLLOW
+        return self.seq_t
+
+    def push(self, t, x, y):
+        if self.count and t <= self.t[self.head]:
+            # same seq again (a resync keyframe): update the newest snapshot
+            self.x[self.head] = x
+            self.y[self.head] = y
+            return
+        h = (self.head + 1) % HISTORY
+        self.t[h] = t
+        self.x[h] = x
+        self.y[h] = y
+        self.head = h
+        if self.count < HISTORY:
+            self.count += 1
+
+    def position(self, t):
+        """Interpolated position at sender time t (ms); holds the newest position when t is past it."""
+        h = self.head
+        if t >= self.t[h] or self.count == 1:
+            return self.x[h], self.y[h]
+        for _ in range(self.count - 1):
+            p = (h - 1) % HISTORY
+            t0 = self.t[p]
+            if t0 <= t:
+                t1 = self.t[h]
+                a = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+                return self.x[p] + (self.x[h] - self.x[p]) * a, self.y[p] + (self.y[h] - self.y[p]) * a
+            h = p
+        return self.x[h], self.y[h]
+
+
+class GhostClient:
+    """Connects a game to a ghost server from a background thread.
+
+    The game calls publish() every frame and update_view() before drawing.
+    Neither touches the socket: publish() just stores the newest state for the
+    sender coroutine, and update_view() reads what the receiver wrote. When the
+    server is unreachable the client keeps retrying in the background.
+    """
+
+    def __init__(self, host='127.0.0.1', port=DEFAULT_PORT, interp_ms=INTERP_MS):
+        self.host = host
+        self.port = port
+        self.interp_ms = interp_ms
+        self.ghost_id = 0
+        self.connected = False
+        self.ghosts = {}
+        # filled by update_view(): positions of the ghosts to draw this frame
+        self.view_x = array('i', bytes(4 * MAX_GHOSTS))
+        self.view_y = array('i', bytes(4 * MAX_GHOSTS))
+        self.count = 0
+        # metrics
+        self.packets_in = 0
+        self.bytes_in = 0
+        self.packets_out = 0
+        self._local = None
+        self._published = 0
+        self._sent = 0
+        self._stop = False
+        self._loop = None
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='ghost-client', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop = True
+        if self._thread:
+            self._thread.join(timeout=1.0)
+
+    # --- game thread side ---
+    def publish(self, x, y, level, keys):
+        """Hand over the local player's state; never blocks."""
+        self._local = (x, y, level, keys)
+        self._published += 1
+
+    def update_view(self, level, t=None):
+        """Interpolate the ghosts on `level` into view_x / view_y. Returns how many there are."""
+        if t is None:
+            t = now_ms()
+        render_t = t - self.interp_ms
+        n = 0
+        # list() so the network thread adding a ghost can't break the iteration
+        for gid, g in list(self.ghosts.items()):
+            if gid == self.ghost_id or g.level != level or g.count == 0:
+                continue
+            if t - g.last_seen > GHOST_TIMEOUT_MS:
+                continue
+            x, y = g.position(render_t - g.offset)
+            self.view_x[n] = int(x)
+            self.view_y[n] = int(y)
+            n += 1
+            if n == MAX_GHOSTS:
+                break
+        self.count = n
+        return n
+
+    # --- network thread side ---
+    def _run(self):
+        asyncio.run(self._main())
+
+    async def _main(self):
+        while not self._stop:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port)
+            except OSError:
+                await asyncio.sleep(2.0)
+                continue
+            self.connected = True
+            sender = asyncio.create_task(self._send_loop(writer))
+            try:
+                await self._receive_loop(reader)
+            except ConnectionError:
+                pass
+            finally:
+                self.connected = False
+                sender.cancel()
+                writer.close()
+                self.ghosts.clear()
+            await asyncio.sleep(1.0)
+
+    async def _send_loop(self, writer):
+        encoder = Encoder()
+        out = bytearray()
+        # fixed-rate ticks: receivers time the packets from seq, one per tick
+        period = 1.0 / TICK_HZ
+        next_send = time.monotonic()
+        while not self._stop:
+            next_send += period
+            delay = next_send - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_send -= delay
+            local = self._local
+            if local is None or self._published == self._sent:
+                encoder.skip()
+                continue
+            self._sent = self._published
+            encoder.encode(local[0], local[1], local[2], local[3], out)
+            writer.write(out)
+            self.packets_out += 1
+            out.clear()
+            if writer.transport.get_write_buffer_size() > SLOW_CLIENT_BYTES:
+                await writer.drain()
+
+    async def _receive_loop(self, reader):
+        decoder = Decoder()
+        ghosts = self.ghosts
+
+        def on_packet(kind, gid, keys, seq, level, a, b):
+            self.packets_in += 1
+            if kind == WELCOME:
+                self.ghost_id = gid
+                return
+            if kind == LEAVE:
+                ghosts.pop(gid, None)
+                return
+            g = ghosts.get(gid)
+            if kind == KEYFRAME:
+                if g is None:
+                    g = Ghost()
+                if g.level != level:
+                    # new level: don't interpolate from the old one
+                    g.count = 0
+                g.level = level
+                g.cur_x = a
+                g.cur_y = b
+            elif g is None:
+                # a delta without a keyframe first cannot be placed; wait for the next keyframe
+                return
+            else:
+                g.cur_x += a
+                g.cur_y += b
+            t = now_ms()
+            g.keys = keys
+            g.last_seen = t
+            g.push(g.stamp(seq, t), g.cur_x, g.cur_y)
+            ghosts[gid] = g
+
+        while not self._stop:
+            data = await reader.read(65536)
+            if not data:
+                break
+            self.bytes_in += len(data)
+            decoder.feed(data, on_packet)
+
+
+def parse_address(text, default_host='127.0.0.1'):
+    """'host:port', 'host' or ':port' -> (host, port)."""
+    host, _, port = text.rpartition(':') if ':' in text else (text, '', '')
+    return host or default_host, int(port) if port else DEFAULT_PORT
+
+
+def start_server_thread(host='0.0.0.0', port=DEFAULT_PORT, timeout=5.0):
+    """Run a GhostServer in a daemon thread (for `Real.py --serve`).
+
+    Returns the port it listens on; raises OSError when it cannot listen
+    (port in use, bad address) or did not start within `timeout` seconds.
+    """
+    ready = threading.Event()
+    result = {}
+
+    def run():
+        async def main():
+            server = GhostServer()
+            try:
+                result['port'] = await server.start(host, port)
+            except OSError as e:
+                result['error'] = e
+                return
+            finally:
+                ready.set()
+            await asyncio.Event().wait()
+        asyncio.run(main())
+
+    threading.Thread(target=run, name='ghost-server', daemon=True).start()
+    if not ready.wait(timeout):
+        raise OSError(f"ghost server on {host}:{port} did not start within {timeout:.0f} s")
+    if 'error' in result:
+        raise result['error']
+    return result['port']
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Ghost race server')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--tick-hz', type=int, default=TICK_HZ)
+    args = parser.parse_args(argv)
+
+    async def run():
+        server = GhostServer(args.tick_hz)
+        port = await server.start(args.host, args.port)
+        print(f"ghost server on {args.host}:{port} at {args.tick_hz} Hz")
+        while True:
+            await asyncio.sleep(10)
+            print(f"{len(server.clients)} clients, {server.packets_in} packets in, {server.bytes_out} bytes out")
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
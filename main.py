@@ -1,40 +1,38 @@
 import pygame
 
+from world import World, PLATFORM, OBSTACLE, DEATH_ZONE, PROP, IN_LEFT, IN_RIGHT, IN_JUMP, IN_FLOAT
+from systems import prototype_physics_system
+
 pygame.init()
 color = (97, 215, 110)
 
+# Alle blokken, de death zone, de vijand en de speler staan in een World (zie world.py)
+world = World()
+world.width = 500000
+
 # Death
-DANGER_ZONE = pygame.Rect(0, 480, 500000, 200)
+world.add(DEATH_ZONE, 0, 480, 500000, 200)
 alive = True
 
-# Player properties
+# Player properties: de sprite is groter dan de hitbox (world.player.rect)
 player_width = 120
 player_height = 100
-player_x = 150
-player_y = 350
-player_speed = 3
+hitbox_width = 80
+hitbox_height = 80
+start_x = 150
+start_y = 350
 
 # Enemy 
 vijand = pygame.image.load('Mayonnaise_Machine.png')
 
 vijand_width = 60
 vijand_height = 90
-vijand_speed = 3
-
-vijandHitbox = vijand.get_rect()
-vijandHitbox.width = 80
-vijandHitbox.height = 80
 
-vijand_x = 500
-vijand_y = 370
+# de hitbox van de vijand is zijn PROP entity in de world
+world.add(PROP, 500, 370, vijand_width, vijand_height)
 
 vijand = pygame.transform.scale(vijand, (vijand_width, vijand_height))
 
-# zwaartekracht en springen
-gravity = 0.5
-vertical_velocity = 0
-jump_strength = -14
-
 # Set up display
 width, height = 900, 500
 screen = pygame.display.set_mode((width, height))
@@ -50,15 +48,32 @@ player = pygame.transform.scale(player, (player_width, player_height))
 text = font.render('Chicken world', True, (83, 64, 175))
 text_rect = text.get_rect(center=(width // 2, height // 2))
 
-# Hitbox van speler
-playerHitbox = player.get_rect()
-playerHitbox.width = 80
-playerHitbox.height = 80
+
+# de speler begint met zijn sprite op (start_x, start_y)
+hitbox = world.player.rect
+hitbox.size = (hitbox_width, hitbox_height)
+hitbox.center = (start_x + player_width // 2, start_y + player_height // 2)
+world.player.y_f = start_y + player_height // 2
+
+
+def read_keys(keys):
+    """De toetsen van het prototype (A/D, spatie, linker shift) als input bits."""
+    bits = 0
+    if keys[pygame.K_a]:
+        bits |= IN_LEFT
+    if keys[pygame.K_d]:
+        bits |= IN_RIGHT
+    if keys[pygame.K_SPACE]:
+        bits |= IN_JUMP
+    if keys[pygame.K_LSHIFT]:
+        bits |= IN_FLOAT
+    return bits
+
 
 # Blokken
-ground = pygame.Rect(0, 450, 300, 50)
-wall = pygame.Rect(400, 350, 50, 400)
-opGrond = False
+world.add(PLATFORM, 0, 450, 300, 50)
+world.add(OBSTACLE, 400, 350, 50, 400)
+world.rebuild()
 
 # Game loop
 while running:
@@ -66,69 +81,19 @@ while running:
         if event.type == pygame.QUIT:
             running = False
 
-
-
-    keys = pygame.key.get_pressed()
-
-    # BEWEGEN- LINKS/RECHTS
-    if keys[pygame.K_a]:
-        player_x -= player_speed
-        if keys[pygame.K_LSHIFT]:
-            player_x -= player_speed
-    if keys[pygame.K_d]:
-        player_x += player_speed
-        if keys[pygame.K_LSHIFT]:
-            player_x += player_speed
-    # SPRINGEN
-    if keys[pygame.K_SPACE]:
-        if playerHitbox.bottom >= ground.top:
-            vertical_velocity = jump_strength
-
-    
-    # ZWAARTEKRACHT
-    if not opGrond:
-        vertical_velocity += gravity
-        player_y += vertical_velocity
-
-    # HITBOX UPDATEN
-    playerHitbox.center = (
-        player_x + player_width // 2,
-        player_y + player_height // 2,
-    )
-
-    # COLLISION MET DE GROND
-    if playerHitbox.colliderect(ground):
-        opGrond = True
-        if vertical_velocity > 0:   # valt omlaag
-            playerHitbox.bottom = ground.top
-            vertical_velocity = 0
-        elif vertical_velocity < 0:  # springt omhoog
-            opGrond = False
-            playerHitbox.top = ground.bottom
-            vertical_velocity = 0
-    else:
-        opGrond = False
-
-    # COLLISION MET DE MUUR
-    if playerHitbox.colliderect(wall):
-        if playerHitbox.right > wall.left and playerHitbox.left < wall.left:
-            playerHitbox.right = wall.left
-            player_x = playerHitbox.left - (player_width - playerHitbox.width) / 2
-        elif playerHitbox.left < wall.right and playerHitbox.right > wall.right:
-            playerHitbox.left = wall.right
-            player_x = playerHitbox.left - (player_width - playerHitbox.width) / 2
-
-    
-    
+    # bewegen, springen, zwaartekracht, grond en muren (systems.py)
+    prototype_physics_system(world, read_keys(pygame.key.get_pressed()))
 
     # TEKENEN
     screen.blit(achtergrond, (0, 0))
-    screen.blit(player, (player_x, player_y))
-    screen.blit(vijand, (vijand_x, vijand_y))
-    pygame.draw.rect(screen, (139, 69, 19), ground)
-    pygame.draw.rect(screen, (139, 69, 19), wall)
-    pygame.draw.rect(screen, (255, 0, 0), playerHitbox, 2)
-    pygame.draw.rect(screen, (255, 51, 51), DANGER_ZONE)
+    screen.blit(player, (hitbox.centerx - player_width // 2, world.player.y_f - player_height // 2))
+    for prop in world.props:
+        screen.blit(vijand, prop.topleft)
+    for block in world.solids:
+        screen.fill((139, 69, 19), block)
+    pygame.draw.rect(screen, (255, 0, 0), hitbox, 2)
+    for zone in world.death_zones:
+        screen.fill((255, 51, 51), zone.clip(screen.get_rect()))
     screen.blit(text, text_rect)
 
 
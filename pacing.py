@@ -0,0 +1,85 @@
+import time
+
+
+class FramePacer:
+    """Frame pacing on top of pygame's Clock that drops rendering (never simulation) when the game falls behind.
+
+    Update + draw time over the frame budget adds to a time debt and unused
+    headroom pays it back. While the debt is larger than half a frame the next
+    frame is simulated but not drawn, which gives the simulation the render
+    time back. At most `max_skip` frames in a row are skipped, so the
+    screen keeps updating even under heavy load.
+    """
+
+    def __init__(self, clock, fps=60, max_skip=3, max_debt_frames=4):
+        self.clock = clock
+        self.fps = fps
+        self.budget_ms = 1000.0 / fps
+        self.max_skip = max_skip
+        # debt is capped so one long hitch (level load, window drag) is not paid back forever
+        self.max_debt_ms = self.budget_ms * max_debt_frames
+        self.debt_ms = 0.0
+        self.render_this_frame = True
+        self.consecutive_skips = 0
+        # metrics
+        self.frames = 0
+        self.rendered_frames = 0
+        self.skipped_frames = 0
+        self.longest_skip_run = 0
+        self.frame_ms = 0.0
+        self.work_ms = 0.0
+        self.sim_hz = 0.0
+        self.render_hz = 0.0
+        self._window_start = time.perf_counter()
+        self._window_frames = 0
+        self._window_renders = 0
+
+    def tick(self):
+        """Wait for the next frame like clock.tick(fps) and decide whether it gets drawn. Returns the frame time in ms."""
+        ms = self.clock.tick(self.fps)
+        self.frame_ms = ms
+        # time spent on update + draw last frame, without the delay added by tick()
+        self.work_ms = self.clock.get_rawtime()
+        # overruns add debt, headroom pays it back (the delay in tick() does not count)
+        self.debt_ms = min(self.max_debt_ms, max(0.0, self.debt_ms + self.work_ms - self.budget_ms))
+
+        if self.debt_ms > self.budget_ms * 0.5 and self.consecutive_skips < self.max_skip:
+            self.render_this_frame = False
+            self.consecutive_skips += 1
+            self.skipped_frames += 1
+            self.longest_skip_run = max(self.longest_skip_run, self.consecutive_skips)
+        else:
+            self.render_this_frame = True
+            self.consecutive_skips = 0
+            self.rendered_frames += 1
+            self._window_renders += 1
+
+        self.frames += 1
+        self._window_frames += 1
+        now = time.perf_counter()
+        elapsed = now - self._window_start
+        if elapsed >= 1.0:
+            self.sim_hz = self._window_frames / elapsed
+            self.render_hz = self._window_renders / elapsed
+            self._window_start = now
+            self._window_frames = 0
+            self._window_renders = 0
+        return ms
+
+    def should_render(self):
+        return self.render_this_frame
+
+    def headroom_ms(self):
+        """How much of the frame budget the last frame left unused (negative when it overran)."""
+        return self.budget_ms - self.work_ms
+
+    def hud_line(self):
+        return (f"sim: {self.sim_hz:.0f} Hz  render: {self.render_hz:.0f} Hz  skipped: {self.skipped_frames}  "
+                f"headroom: {self.headroom_ms():.0f} ms")
+
+    def report(self):
+        if not self.frames:
+            return "pacing: no frames"
+        return (f"pacing: {self.frames} frames simulated, {self.rendered_frames} rendered, "
+                f"{self.skipped_frames} skipped (longest run {self.longest_skip_run}), "
+                f"last sim rate {self.sim_hz:.1f} Hz")
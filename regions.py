@@ -0,0 +1,272 @@
+"""Region files: very wide levels that are streamed from disk as the camera moves.
+
+A region file cuts the level into vertical strips of `region_width` pixels.
+Each strip has its own run of fixed-size records (static entities and
+machines), and an entity that crosses strips is stored in every strip it
+touches. The file is memory-mapped and only the strips around the camera are
+read into the World's component arrays, so the Rect views, collision lists and
+sprites stay the size of the screen plus a margin, however wide the level is.
+
+    python regions.py convert levels/level2.json levels/level2.rgn
+    python regions.py generate levels/level4.rgn --width 500000
+    python regions.py info levels/level4.rgn
+
+build_level() uses levels/level<N>.rgn when it exists, before level<N>.json.
+"""
+import argparse
+import json
+import mmap
+import random
+import struct
+import sys
+from array import array
+
+from world import (WIDTH, GROUND_Y, MACHINE_SIZE, PLATFORM, OBSTACLE, HOLE, SPIKE, JUMP_PAD, FINISH, CHECKPOINT,
+                   KIND_NAMES, World, load_json_level)
+
+MAGIC = b'SRGN'
+VERSION = 1
+# magic, version, world width, region width, region count
+HEADER = struct.Struct('<4sHxxIII')
+# first record and record count of one region
+INDEX = struct.Struct('<II')
+# id, kind, machine direction, shoot interval, x, y, w, h, projectile speed
+RECORD = struct.Struct('<IBbHiiiif')
+# record kind for machines (the other kinds are the World's static kinds)
+MACHINE = len(KIND_NAMES)
+DEFAULT_REGION_WIDTH = 1024
+
+
+class RegionStreamer:
+    """Keeps the regions around the camera of a region file loaded into a World.
+
+    Resident entities are cut off at the edges of the resident strip, which is
+    always at least `margin` pixels outside the screen. Machines that leave the
+    strip are dropped and get a new shot timer when they come back.
+    """
+
+    def __init__(self, path, margin=None):
+        self.path = str(path)
+        self._open()
+        self.margin = self.region_width if margin is None else margin
+        self.first = -1
+        self.last = -1
+        # region file id of every machine in the World's machine arrays
+        self.machine_ids = array('I')
+        self.loads = 0
+
+    def _open(self):
+        self._file = open(self.path, 'rb')
+        self._map = None
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, self.world_width, self.region_width, self.count = HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error):
+            # empty file (mmap fails) or shorter than the header
+            if self._map is not None:
+                self._map.close()
+            self._file.close()
+            raise ValueError(f"{self.path} is not a region file")
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{self.path} is not a region file (version {VERSION})")
+        self._records = HEADER.size + INDEX.size * self.count
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    # worlds are pickled by replay_render.py; the map is opened again on unpickling
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_file'], state['_map']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._open()
+
+    def attach(self, world):
+        """Make this file the level of `world` and load the regions at the start of the level."""
+        world.clear()
+        world.width = self.world_width
+        world.regions = self
+        self.first = self.last = -1
+        del self.machine_ids[:]
+        self.update(world, 0)
+
+    def update(self, world, camera_x=None):
+        """Load and drop regions so the camera window plus the margin is resident.
+
+        Called every frame by systems.step; it only reads the file when the
+        camera crosses into another region.
+        """
+        if camera_x is None:
+            camera_x = world.camera_x
+        first = (camera_x - self.margin) // self.region_width
+        last = (camera_x + WIDTH + self.margin) // self.region_width
+        if first < 0:
+            first = 0
+        if last >= self.count:
+            last = self.count - 1
+        if first != self.first or last != self.last:
+            self._load(world, first, last)
+
+    def _load(self, world, first, last):
+        lo = first * self.region_width
+        hi = (last + 1) * self.region_width
+        # machines that stay resident keep their shot timers
+        timers = dict(zip(self.machine_ids, world.m_last_shot))
+        for arr in (world.kind, world.x, world.y, world.w, world.h,
+                    world.m_x, world.m_y, world.m_dir, world.m_interval, world.m_last_shot, world.m_speed):
+            del arr[:]
+        del self.machine_ids[:]
+
+        seen = set()
+        mm = self._map
+        for r in range(first, last + 1):
+            start, n = INDEX.unpack_from(mm, HEADER.size + r * INDEX.size)
+            for rid, kind, direction, interval, x, y, w, h, speed in RECORD.iter_unpack(
+                    mm[self._records + start * RECORD.size:self._records + (start + n) * RECORD.size]):
+                # entities that cross regions are stored once per region
+                if rid in seen:
+                    continue
+                seen.add(rid)
+                if kind == MACHINE:
+                    i = world.add_machine(x, y, direction, interval, speed)
+                    self.machine_ids.append(rid)
+                    if rid in timers:
+                        world.m_last_shot[i] = timers[rid]
+                    continue
+                left = max(x, lo)
+                right = min(x + w, hi)
+                if right > left:
+                    world.add(kind, left, y, right - left, h)
+
+        self._drop_pages(first, last)
+        self.first = first
+        self.last = last
+        self.loads += 1
+        world.rebuild()
+
+    def _drop_pages(self, first, last):
+        """Let the OS drop the file pages of regions that are no longer resident."""
+        if self.first < 0 or not hasattr(mmap, 'MADV_DONTNEED'):
+            return
+        for r in range(self.first, self.last + 1):
+            if first <= r <= last:
+                continue
+            start, n = INDEX.unpack_from(self._map, HEADER.size + r * INDEX.size)
+            begin = self._records + start * RECORD.size
+            end = begin + n * RECORD.size
+            begin -= begin % mmap.PAGESIZE
+            if end > begin:
+                self._map.madvise(mmap.MADV_DONTNEED, begin, end - begin)
+
+
+# --- WRITING ---
+def write_regions(path, world, region_width=DEFAULT_REGION_WIDTH):
+    """Write the static entities and machines of `world` as a region file.
+
+    `world` only needs its arrays filled (World.add / add_machine); it does not
+    have to be rebuilt, so levels far too big to play unstreamed can be written.
+    """
+    count = max(1, -(-world.width // region_width))
+    regions = [[] for _ in range(count)]
+
+    def place(record, left, right):
+        r = max(0, left // region_width)
+        end = min(count - 1, max(left, right - 1) // region_width)
+        while r <= end:
+            regions[r].append(record)
+            r += 1
+
+    n = len(world.kind)
+    for i in range(n):
+        x, w = world.x[i], world.w[i]
+        place(RECORD.pack(i, world.kind[i], 0, 0, x, world.y[i], w, world.h[i], 0.0), x, x + w)
+    for i in range(len(world.m_x)):
+        x = world.m_x[i]
+        place(RECORD.pack(n + i, MACHINE, world.m_dir[i], min(world.m_interval[i], 0xFFFF), x, world.m_y[i],
+                          MACHINE_SIZE, MACHINE_SIZE, world.m_speed[i]), x, x + MACHINE_SIZE)
+
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, world.width, region_width, count))
+        first = 0
+        for records in regions:
+            f.write(INDEX.pack(first, len(records)))
+            first += len(records)
+        for records in regions:
+            f.writelines(records)
+    return sum(len(records) for records in regions)
+
+
+def generate_world(world, width, seed=0):
+    """Fill `world` with a procedural level of `width` pixels, built from short sections."""
+    rng = random.Random(seed)
+    world.clear()
+    world.width = width
+    world.add(PLATFORM, 0, GROUND_Y, width, 50)
+    x = 400
+    end = width - 600
+    while x < end:
+        section = rng.randrange(5)
+        if section == 0:
+            # hole, jumpable from the ground
+            world.add(HOLE, x, GROUND_Y, rng.randint(60, 120), 50)
+        elif section == 1:
+            world.add(SPIKE, x, GROUND_Y - 16, rng.choice([32, 64]), 16)
+        elif section == 2:
+            h_off = rng.choice([80, 100, 140, 160])
+            world.add(OBSTACLE, x, GROUND_Y - h_off, rng.randint(80, 180), 16)
+            if h_off >= 140:
+                world.add(JUMP_PAD, max(50, x - 80), GROUND_Y - 16, 40, 8)
+        elif section == 3:
+            world.add_machine(x, GROUND_Y - 220, direction=1, shoot_interval=rng.randint(1200, 2000))
+        else:
+            world.add(PLATFORM, x, GROUND_Y - rng.choice([90, 120]), rng.randint(100, 220), 16)
+        if x // 5000 != (x + 600) // 5000:
+            world.add(CHECKPOINT, x + 200, GROUND_Y - 40, 24, 40)
+        x += rng.randint(260, 600)
+    world.add(FINISH, width - 80, GROUND_Y - 120, 40, 120)
+
+
+# --- COMMAND LINE ---
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('convert', help='convert a JSON level to a region file')
+    p.add_argument('json')
+    p.add_argument('out')
+    p.add_argument('--region-width', type=int, default=DEFAULT_REGION_WIDTH)
+    p = sub.add_parser('generate', help='write a procedural level of any width')
+    p.add_argument('out')
+    p.add_argument('--width', type=int, default=500000)
+    p.add_argument('--seed', type=int, default=0)
+    p.add_argument('--region-width', type=int, default=DEFAULT_REGION_WIDTH)
+    p = sub.add_parser('info', help='show the regions of a region file')
+    p.add_argument('file')
+    args = parser.parse_args(argv)
+
+    if args.command == 'info':
+        streamer = RegionStreamer(args.file)
+        sizes = [INDEX.unpack_from(streamer._map, HEADER.size + r * INDEX.size)[1] for r in range(streamer.count)]
+        print(f"{args.file}: {streamer.world_width} px wide, {streamer.count} regions of {streamer.region_width} px")
+        print(f"records: {sum(sizes)} ({RECORD.size} bytes each), per region min {min(sizes)} / max {max(sizes)}")
+        streamer.close()
+        return 0
+
+    world = World()
+    if args.command == 'convert':
+        with open(args.json, 'r', encoding='utf8') as f:
+            load_json_level(world, json.load(f))
+    else:
+        generate_world(world, args.width, args.seed)
+    n = write_regions(args.out, world, args.region_width)
+    print(f"wrote {args.out}: {world.width} px, {len(world.kind)} entities and {len(world.m_x)} machines "
+          f"as {n} records")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
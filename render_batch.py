@@ -0,0 +1,400 @@
+import math
+import time
+from itertools import islice
+
+import pygame
+
+# colors used by the pre-rendered sprites (same as the old per-frame draw calls)
+SPIKE_COLOR = (160, 20, 20)
+PAD_COLOR = (255, 255, 0)
+PROJECTILE_COLOR = (240, 240, 200)
+PLATFORM_COLOR = (100, 60, 40)
+OBSTACLE_COLOR = (140, 100, 60)
+MACHINE_COLOR = (190, 190, 210)
+NOZZLE_COLOR = (160, 160, 180)
+POLE_COLOR = (80, 50, 30)
+FLAG_COLOR = (200, 20, 20)
+FLAG_EDGE_COLOR = (60, 30, 30)
+
+GHOST_ALPHA = 110
+
+# the finish flag waves between -FLAG_SWING and +FLAG_SWING pixels
+FLAG_SWING = 6
+
+
+class SpriteCache:
+    """Pre-renders sprites once per size so the main loop only has to blit them.
+
+    Every getter returns (surface, dx, dy): the sprite and the offset from the
+    entity's rect topleft where it has to be blitted.
+
+    Sizes come from the level data. Streamed levels (regions.py) keep bringing
+    in new ones, so the cache starts over when it holds `max_entries` sprites.
+    """
+
+    def __init__(self, max_entries=512):
+        self._cache = {}
+        self.max_entries = max_entries
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        self._cache.clear()
+
+    def _store(self, key, sprite):
+        if len(self._cache) >= self.max_entries:
+            self._cache.clear()
+        self._cache[key] = sprite
+        return sprite
+
+    def spikes(self, w, h):
+        """A whole strip of spike triangles for a spike rect of size (w, h)."""
+        key = ('spikes', w, h)
+        sprite = self._cache.get(key)
+        if sprite is None:
+            step = w // 4 if w >= 4 else 4
+            # the last triangle may stick out past w, just like the old drawing did
+            surf = pygame.Surface((max(1, w + step), max(1, h + 1)), pygame.SRCALPHA)
+            for x in range(0, w, step):
+                pygame.draw.polygon(surf, SPIKE_COLOR, [(x, h), (x + step // 2, 0), (x + step, h)])
+            sprite = self._store(key, (surf, 0, 0))
+        return sprite
+
+    def block(self, w, h, color):
+        """Solid rectangle (jump pads)."""
+        key = ('block', w, h, color)
+        sprite = self._cache.get(key)
+        if sprite is None:
+            surf = pygame.Surface((max(1, w), max(1, h))).convert()
+            surf.fill(color)
+            sprite = self._store(key, (surf, 0, 0))
+        return sprite
+
+    def pad(self, w, h):
+        return self.block(w, h, PAD_COLOR)
+
+    def projectile(self, w, h):
+        key = ('projectile', w, h)
+        sprite = self._cache.get(key)
+        if sprite is None:
+            surf = pygame.Surface((max(1, w), max(1, h)), pygame.SRCALPHA)
+            pygame.draw.ellipse(surf, PROJECTILE_COLOR, surf.get_rect())
+            sprite = self._store(key, (surf, 0, 0))
+        return sprite
+
+    def machine(self, w, h, direction):
+        """Fallback machine sprite (used when Mayonnaise_Machine.png is missing)."""
+        key = ('machine', w, h, direction)
+        sprite = self._cache.get(key)
+        if sprite is None:
+            # the nozzle sticks out of the body, so leave room on both sides
+            margin = 24
+            surf = pygame.Surface((w + margin * 2, h), pygame.SRCALPHA)
+            surf.fill(MACHINE_COLOR, (margin, 0, w, h))
+            nozzle = (margin + w // 2 + direction * 18, h // 2)
+            pygame.draw.circle(surf, NOZZLE_COLOR, nozzle, 6)
+            sprite = self._store(key, (surf, -margin, 0))
+        return sprite
+
+    def particle(self, r, color):
+        key = ('particle', r, color)
+        sprite = self._cache.get(key)
+        if sprite is None:
+            surf = pygame.Surface((r * 2 + 1, r * 2 + 1), pygame.SRCALPHA)
+            pygame.draw.circle(surf, color, (r, r), r)
+            sprite = self._store(key, (surf, -r, -r))
+        return sprite
+
+    def flag(self, w, h, off):
+        """Finish pole + banner, one sprite per wave offset (-FLAG_SWING..FLAG_SWING)."""
+        key = ('flag', w, h, off)
+        sprite = self._cache.get(key)
+        if sprite is None:
+            # sprite origin is (fr.x, fr.y - 10) so the taller pole fits
+            top = 10
+            surf = pygame.Surface((w + FLAG_SWING + 2, h + top), pygame.SRCALPHA)
+            pole_x = w // 2 - 3
+            surf.fill(POLE_COLOR, (pole_x, 0, 6, h + top))
+            flag_top = top + 12
+            points = [
+                (6, flag_top),
+                (w + off, flag_top - 6),
+                (w - 4 + off, flag_top + 12),
+                (6, flag_top + 20)
+            ]
+            pygame.draw.polygon(surf, FLAG_COLOR, points)
+            pygame.draw.polygon(surf, FLAG_EDGE_COLOR, points, 2)
+            sprite = self._store(key, (surf, 0, -top))
+        return sprite
+
+
+def flag_offset(ticks):
+    """Wave offset of the finish banner at time `ticks` (ms)."""
+    return int(FLAG_SWING * math.sin(ticks / 180.0))
+
+
+class RenderBatch:
+    """One draw layer: collects (surface, position) pairs and submits them with a single Surface.blits.
+
+    The [surface, Rect] entries are kept between frames and overwritten in
+    place, so queueing a sprite does not allocate once the layer has grown to
+    its usual size.
+    """
+
+    def __init__(self, name, stats=None):
+        self.name = name
+        self.items = []
+        self.count = 0
+        self.stats = stats
+
+    def __len__(self):
+        return self.count
+
+    def add(self, sprite, x, y):
+        """Queue a SpriteCache sprite for the rect whose topleft is (x, y) on screen."""
+        surf, dx, dy = sprite
+        self.add_surface(surf, x + dx, y + dy)
+
+    def add_surface(self, surf, x, y):
+        i = self.count
+        if i == len(self.items):
+            self.items.append([surf, pygame.Rect(x, y, 0, 0)])
+        else:
+            item = self.items[i]
+            item[0] = surf
+            dest = item[1]
+            dest.x = x
+            dest.y = y
+        self.count = i + 1
+
+    def flush(self, target):
+        n = self.count
+        if n:
+            if n == len(self.items):
+                target.blits(self.items, False)
+            else:
+                target.blits(islice(self.items, n), False)
+            if self.stats:
+                self.stats.count(1, n)
+            self.count = 0
+
+
+def load_image(path, size=None):
+    """Load an image, or return None so callers fall back to colored rectangles."""
+    try:
+        im = pygame.image.load(path).convert_alpha()
+        if size:
+            im = pygame.transform.scale(im, size)
+        return im
+    except Exception:
+        return None
+
+
+class Renderer:
+    """Images, sprite cache, draw layers and stats used by the render system."""
+
+    def __init__(self, player_img=None, machine_img=None, bg_img=None):
+        self.player_img = player_img
+        self.machine_img = machine_img
+        # cache flipped machine image for machines that shoot up
+        self.machine_img_up = pygame.transform.flip(machine_img, True, False) if machine_img else None
+        self.bg_img = bg_img
+        self.sprites = SpriteCache()
+        self.stats = RenderStats()
+        self.hazard_layer = RenderBatch('hazards', self.stats)
+        self.machine_layer = RenderBatch('machines', self.stats)
+        self.effect_layer = RenderBatch('effects', self.stats)
+        self.ghost_layer = RenderBatch('ghosts', self.stats)
+        self.hud_layer = RenderBatch('hud', self.stats)
+        self._bg = None
+        self._bg_width = None
+        self.bg_tile = 1
+        self._ghosts = {}
+        # reused for the few direct draws that need a Rect
+        self.scratch = pygame.Rect(0, 0, 0, 0)
+
+    def ghost_image(self, w, h):
+        """See-through copy of the player, for other players in a ghost race."""
+        key = (w, h)
+        surf = self._ghosts.get(key)
+        if surf is None:
+            if self.player_img:
+                surf = self.player_img.copy()
+            else:
+                surf = pygame.Surface((w, h)).convert()
+                surf.fill((255, 220, 180))
+            surf.set_alpha(GHOST_ALPHA)
+            self._ghosts[key] = surf
+        return surf
+
+    def machine_image(self, direction):
+        if direction == -1 and self.machine_img_up:
+            return self.machine_img_up
+        return self.machine_img
+
+    def background(self, view_width):
+        """Background tiles for one screen plus one tile, drawn at -(camera_x % bg_tile).
+
+        Only as wide as the view, so it costs the same for any level width.
+        """
+        if self._bg_width != view_width:
+            self._bg_width = view_width
+            try:
+                height = pygame.display.get_surface().get_height()
+                self.bg_tile = self.bg_img.get_width() if self.bg_img else view_width
+                self._bg = pygame.Surface((view_width + self.bg_tile, height)).convert()
+                if self.bg_img:
+                    for x in range(0, view_width + self.bg_tile, self.bg_tile):
+                        self._bg.blit(self.bg_img, (x, 0))
+                else:
+                    self._bg.fill((153, 211, 232))
+            except Exception:
+                self._bg = None
+        return self._bg
+
+
+class Hud:
+    """Counters, controls help and the game over / level complete screens."""
+
+    color = (245, 245, 245)
+
+    def __init__(self, font, large_font, layer, size):
+        self.font = font
+        self.large_font = large_font
+        self.layer = layer
+        self.width, self.height = size
+        # translucent overlay behind the game over / level complete text
+        self.overlay = pygame.Surface(size, pygame.SRCALPHA)
+        self.overlay.fill((0, 0, 0, 150))
+        # rendered strings, so unchanged text is not re-rendered every frame
+        self._text_cache = {}
+        # counters are drawn from a label and digit glyphs rendered once, so a changing
+        # score does not render a new text surface every frame
+        self._labels = {}
+        self._digits = [font.render(str(d), True, self.color) for d in range(10)]
+        self._digit_widths = [d.get_width() for d in self._digits]
+        self._minus = font.render('-', True, self.color)
+
+    def text(self, text, color, f=None):
+        f = f or self.font
+        key = (text, color, id(f))
+        surf = self._text_cache.get(key)
+        if surf is None:
+            if len(self._text_cache) > 128:
+                self._text_cache.clear()
+            surf = f.render(text, True, color)
+            self._text_cache[key] = surf
+        return surf
+
+    def value(self, label, value, x, y):
+        """Add "label: value" at (x, y) to the HUD layer."""
+        layer = self.layer
+        surf = self._labels.get(label)
+        if surf is None:
+            surf = self._labels[label] = self.font.render(label + ": ", True, self.color)
+        layer.add_surface(surf, x, y)
+        x += surf.get_width()
+        if value < 0:
+            layer.add_surface(self._minus, x, y)
+            x += self._minus.get_width()
+            value = -value
+        # measure the number, then add its digits from right to left
+        widths = self._digit_widths
+        n = value // 10
+        x += widths[value % 10]
+        while n:
+            x += widths[n % 10]
+            n //= 10
+        while True:
+            d = value % 10
+            x -= widths[d]
+            layer.add_surface(self._digits[d], x, y)
+            value //= 10
+            if not value:
+                break
+
+    def draw(self, screen, world, extra_lines=None):
+        layer = self.layer
+        col = self.color
+        self.value("Eggs", world.player.eggs, 16, 16)
+        self.value("Score", world.player.score, 16, 48)
+        self.value("Level", world.level, 16, 80)
+        layer.add_surface(self.text("Arrow keys / A-D-Space = Move", col), 520, self.height - 500)
+        layer.add_surface(self.text("Shift in air = Float", col), 670, self.height - 470)
+        if extra_lines:
+            y = self.height - 32 * len(extra_lines)
+            for line in extra_lines:
+                layer.add_surface(self.text(line, col), 16, y)
+                y += 32
+        layer.flush(screen)
+
+        if world.game_over:
+            self.banner(screen, self.text("Game Over", (255, 230, 230), self.large_font),
+                        self.text("Press R to restart or ESC to quit", col))
+        if world.win:
+            if world.final_victory:
+                # Dutch victory message
+                self.banner(screen, self.text("Gefeliciteerd! Je hebt alle levels voltooid!", col, self.large_font),
+                            self.text("Druk op R om opnieuw te beginnen of ESC om af te sluiten", col))
+            else:
+                self.banner(screen, self.text("Level Voltooid!", col, self.large_font),
+                            self.text("Druk op R om door te gaan of ESC om te stoppen", col))
+
+    def banner(self, screen, title, info):
+        # translucent background for readability
+        screen.blit(self.overlay, (0, 0))
+        screen.blit(title, (self.width // 2 - title.get_width() // 2, self.height // 2 - 60))
+        screen.blit(info, (self.width // 2 - info.get_width() // 2, self.height // 2 + 10))
+
+
+class RenderStats:
+    """Counts draw calls and measures render time, averaged over the last second or so."""
+
+    def __init__(self, smoothing=0.05):
+        self.smoothing = smoothing
+        self.draw_calls = 0
+        self.sprites = 0
+        self.render_ms = 0.0
+        # smoothed values for the HUD / exit report
+        self.avg_draw_calls = 0.0
+        self.avg_sprites = 0.0
+        self.avg_render_ms = 0.0
+        self.peak_render_ms = 0.0
+        self.frames = 0
+        self.total_render_ms = 0.0
+        self._start = 0.0
+
+    def begin(self):
+        self.draw_calls = 0
+        self.sprites = 0
+        self._start = time.perf_counter()
+
+    def count(self, calls=1, sprites=1):
+        self.draw_calls += calls
+        self.sprites += sprites
+
+    def end(self):
+        self.render_ms = (time.perf_counter() - self._start) * 1000.0
+        if self.frames == 0:
+            self.avg_draw_calls = float(self.draw_calls)
+            self.avg_sprites = float(self.sprites)
+            self.avg_render_ms = self.render_ms
+        else:
+            a = self.smoothing
+            self.avg_draw_calls += (self.draw_calls - self.avg_draw_calls) * a
+            self.avg_sprites += (self.sprites - self.avg_sprites) * a
+            self.avg_render_ms += (self.render_ms - self.avg_render_ms) * a
+        self.peak_render_ms = max(self.peak_render_ms, self.render_ms)
+        self.total_render_ms += self.render_ms
+        self.frames += 1
+
+    def hud_line(self):
+        return f"draws: {self.avg_draw_calls:.0f}  sprites: {self.avg_sprites:.0f}  render: {self.avg_render_ms:.2f} ms"
+
+    def report(self):
+        if not self.frames:
+            return "render: no frames drawn"
+        mean = self.total_render_ms / self.frames
+        return (f"render: {self.frames} frames, {self.avg_draw_calls:.1f} draw calls/frame, "
+                f"{self.avg_sprites:.1f} sprites/frame, {mean:.2f} ms mean, {self.peak_render_ms:.2f} ms peak")
@@ -0,0 +1,80 @@
+"""Recorded runs: the seed, the start level and the input of every frame.
+
+The simulation only depends on World(seed), the input bits and the frame time
+of each frame, so that is all a replay stores (3 bytes per frame). Playing it
+back through systems.step gives the same run again, frame for frame. The
+player's final state is stored as well, so a replay can check that it really
+ended up in the same place.
+"""
+import struct
+from array import array
+
+from world import World, build_level
+from systems import step
+
+MAGIC = b'SRRP'
+VERSION = 1
+# magic, version, start level, seed, frame count
+HEADER = struct.Struct('<4sHHII')
+# x, y, score, eggs, level, frame
+FOOTER = struct.Struct('<iiiiII')
+
+
+class Replay:
+    def __init__(self, seed, level=1):
+        self.seed = seed
+        self.level = level
+        self.bits = array('B')
+        self.ms = array('H')
+        self.final = None
+
+    def __len__(self):
+        return len(self.bits)
+
+    def record(self, bits, ms):
+        self.bits.append(bits & 0xFF)
+        self.ms.append(min(int(ms), 0xFFFF))
+
+    def new_world(self):
+        """A world in the state the recording started from."""
+        world = World(self.seed)
+        build_level(world, self.level)
+        return world
+
+    def play(self, world, start, end):
+        """Run frames [start, end) on `world`."""
+        bits = self.bits
+        ms = self.ms
+        for f in range(start, end):
+            step(world, bits[f], ms[f])
+
+    def save(self, path, world=None):
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.level, self.seed, len(self.bits)))
+            self.bits.tofile(f)
+            self.ms.tofile(f)
+            if world is not None:
+                f.write(final_state(world))
+
+    def matches(self, world):
+        """True if `world` ended where the recording did (or the recording has no end state)."""
+        return self.final is None or self.final == final_state(world)
+
+
+def final_state(world):
+    p = world.player
+    return FOOTER.pack(p.rect.x, p.rect.y, p.score, p.eggs, world.level, world.frame)
+
+
+def load_replay(path):
+    with open(path, 'rb') as f:
+        magic, version, level, seed, frames = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a replay file (version {VERSION})")
+        replay = Replay(seed, level)
+        replay.bits.fromfile(f, frames)
+        replay.ms.fromfile(f, frames)
+        final = f.read(FOOTER.size)
+        if len(final) == FOOTER.size:
+            replay.final = final
+    return replay
@@ -0,0 +1,162 @@
+"""Render a recorded run (Real.py --record) to frames, offline and in parallel.
+
+    python replay_render.py run.rpl --out frames/             # frames/frame_000000.png, ...
+    python replay_render.py run.rpl --raw run.rgb             # raw RGB24 stream, 900x500 per frame
+    python replay_render.py run.rpl --raw - | ffmpeg -f rawvideo -pix_fmt rgb24 -s 900x500 -r 60 -i - clip.mp4
+
+The run is simulated once in this process (that is fast), and the world is
+pickled at the start of every chunk of frames. A process pool then renders
+the chunks with the SDL dummy driver, each worker starting from its own
+checkpoint, so chunks render independently and the speed scales with the
+number of cores. Raw frames are written straight to their offset in the output
+file, so no joining step is needed. With `--raw -` the workers hand their
+chunks back and they are written to stdout in order as soon as they are done.
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+# stdout may be the video stream
+os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+
+import pygame
+
+from world import WIDTH, HEIGHT
+from systems import step, render_system
+from render_batch import Renderer, Hud, load_image
+from replay import load_replay
+
+FRAME_BYTES = WIDTH * HEIGHT * 3
+
+# per worker process, set up by _init_worker
+_screen = None
+_renderer = None
+_hud = None
+
+
+def _init_worker(with_hud):
+    global _screen, _renderer, _hud
+    pygame.init()
+    _screen = pygame.display.set_mode((WIDTH, HEIGHT))
+    _renderer = Renderer(load_image('Kip.png', (48, 48)), load_image('Mayonnaise_Machine.png', (48, 48)),
+                         load_image('achtergrond 3.jpg', (WIDTH, HEIGHT)))
+    if with_hud:
+        _hud = Hud(pygame.font.SysFont(None, 36), pygame.font.SysFont(None, 64), _renderer.hud_layer, (WIDTH, HEIGHT))
+
+
+def render_chunk(task):
+    """Render frames [start, end) from the checkpoint taken before frame `start`.
+
+    Writes PNGs to `out_dir` or raw frames into `raw_path`; with neither, the
+    raw frames are returned as bytes. Returns the number of frames otherwise.
+    """
+    start, end, state, bits, ms, out_dir, raw_path, first = task
+    world = pickle.loads(state)
+    raw = open(raw_path, 'r+b') if raw_path else None
+    frames = bytearray() if not (raw or out_dir) else None
+    try:
+        if raw:
+            raw.seek((start - first) * FRAME_BYTES)
+        for i in range(end - start):
+            step(world, bits[i], ms[i])
+            render_system(world, _screen, _renderer)
+            if _hud:
+                _hud.draw(_screen, world)
+            if raw:
+                raw.write(pygame.image.tobytes(_screen, 'RGB'))
+            elif out_dir:
+                pygame.image.save(_screen, os.path.join(out_dir, f'frame_{start + i:06d}.png'))
+            else:
+                frames += pygame.image.tobytes(_screen, 'RGB')
+    finally:
+        if raw:
+            raw.close()
+    return frames if frames is not None else end - start
+
+
+def checkpoints(replay, start, end, chunk):
+    """Simulate the run and yield (chunk_start, chunk_end, pickled world before chunk_start)."""
+    world = replay.new_world()
+    replay.play(world, 0, start)
+    for s in range(start, end, chunk):
+        e = min(end, s + chunk)
+        yield s, e, pickle.dumps(world, pickle.HIGHEST_PROTOCOL)
+        replay.play(world, s, e)
+    if end == len(replay) and not replay.matches(world):
+        print("warning: the replay did not end in the recorded state; levels or game code changed since recording",
+              file=sys.stderr)
+
+
+def _finish(result, out, done, frames):
+    """Handle one finished chunk (in order): write it to `out` when streaming. Returns its frame count."""
+    if out is not None:
+        out.write(result)
+        out.flush()
+        result = len(result) // FRAME_BYTES
+    print(f"\r{done + result}/{frames} frames", end='', file=sys.stderr)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('replay')
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument('--out', metavar='DIR', help='write a PNG sequence to this directory')
+    target.add_argument('--raw', metavar='FILE', help="write raw RGB24 frames to this file ('-' for stdout)")
+    parser.add_argument('--start', type=int, default=0, help='first frame')
+    parser.add_argument('--end', type=int, default=None, help='frame to stop before (default: the whole run)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--chunk', type=int, default=120, help='frames per task')
+    parser.add_argument('--no-hud', action='store_true', help='leave out eggs/score/level and the overlays')
+    args = parser.parse_args(argv)
+
+    replay = load_replay(args.replay)
+    end = len(replay) if args.end is None else min(args.end, len(replay))
+    start = max(0, min(args.start, end))
+    frames = end - start
+    if frames == 0:
+        print("nothing to render", file=sys.stderr)
+        return 1
+
+    # streamed chunks go to stdout, in order
+    out = sys.stdout.buffer if args.raw == '-' else None
+    raw_path = None
+    if args.raw and out is None:
+        # workers write into a preallocated file at their own offsets
+        raw_path = args.raw
+        with open(raw_path, 'wb') as f:
+            f.truncate(frames * FRAME_BYTES)
+    elif args.out:
+        os.makedirs(args.out, exist_ok=True)
+
+    t0 = time.perf_counter()
+    tasks = ((s, e, state, replay.bits[s:e], replay.ms[s:e], args.out, raw_path, start)
+             for s, e, state in checkpoints(replay, start, end, args.chunk))
+    done = 0
+    # a few chunks per worker in flight: keeps the workers busy without holding
+    # the whole run (or all of its checkpoints) in memory
+    pending = deque()
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker, initargs=(not args.no_hud,)) as pool:
+        for task in tasks:
+            pending.append(pool.submit(render_chunk, task))
+            if len(pending) >= args.workers * 2:
+                done += _finish(pending.popleft().result(), out, done, frames)
+        while pending:
+            done += _finish(pending.popleft().result(), out, done, frames)
+    elapsed = time.perf_counter() - t0
+    print(file=sys.stderr)
+
+    run_time = sum(replay.ms[start:end]) / 1000.0
+    print(f"rendered {frames} frames in {elapsed:.2f} s with {args.workers} workers: "
+          f"{frames / elapsed:.0f} frames/s, {run_time / elapsed:.1f}x real time", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,424 @@
+import math
+
+from world import (WIDTH, HEIGHT, GROUND_Y, PLAYER_SPEED, JUMP_POWER, GRAVITY, MAX_FLOAT_MS,
+                   MACHINE_SIZE, PROJECTILE_SIZE, PLATFORM,
+                   IN_LEFT, IN_RIGHT, IN_JUMP, IN_FLOAT, IN_RESTART,
+                   restart, advance_level)
+from render_batch import flag_offset, PLATFORM_COLOR, OBSTACLE_COLOR
+
+EFFECT_COLOR = (255, 0, 0)
+
+
+def play_egg_sound():
+    pass
+
+
+def spawn_egg_lost_effect(world, x, y, count=12):
+    """Spawn `count` small particles at (x, y)."""
+    rng = world.rng
+    for i in range(count):
+        ang = rng.random() * math.pi * 2
+        speed = rng.uniform(1.5, 4.0)
+        world.spawn_effect(x, y, math.cos(ang) * speed, math.sin(ang) * speed * -0.5,
+                           rng.uniform(0.6, 1.2), rng.randint(2, 5))
+
+
+def lose_egg(world, count=12):
+    p = world.player.rect
+    spawn_egg_lost_effect(world, p.centerx, p.centery, count)
+    play_egg_sound()
+
+
+# --- SYSTEMS ---
+def physics_system(world, bits, dt_ms):
+    """Player input, gravity and collision with platforms, obstacles, holes and the ground."""
+    player = world.player
+    rect = player.rect
+    # save previous bottom and sides to help with platform collision detection
+    prev_bottom = world.prev_bottom = rect.bottom
+    prev_left = rect.left
+    prev_right = rect.right
+
+    if bits & IN_LEFT:
+        rect.x -= PLAYER_SPEED
+    if bits & IN_RIGHT:
+        rect.x += PLAYER_SPEED
+    if bits & IN_JUMP and player.on_ground:
+        player.vel_y = -JUMP_POWER
+        player.on_ground = False
+        player.float_timer = 0
+        player.is_floating = False
+    # Zweven (alleen in de lucht)
+    if not player.on_ground and bits & IN_FLOAT:
+        if player.float_timer < MAX_FLOAT_MS:
+            player.vel_y = 0
+            player.is_floating = True
+            player.float_timer += dt_ms
+        else:
+            player.is_floating = False
+    else:
+        player.is_floating = False
+
+    player.vel_y += GRAVITY
+    rect.y += int(player.vel_y)
+    # keep inside level horizontally (clamp to world)
+    if rect.left < 0:
+        rect.left = 0
+    if rect.right > world.width:
+        rect.right = world.width
+    # score: farthest x reached
+    if rect.x > player.score:
+        player.score = rect.x
+
+    # whether the player is centered over a hole (used to avoid snapping to ground)
+    px = rect.centerx
+    over_hole = False
+    for h in world.holes:
+        if h.left <= px <= h.right:
+            over_hole = True
+            break
+
+    solids = world.solids
+    # ---- X-axis collision (zijkanten) ----
+    if rect.collidelist(solids) != -1:
+        for obj in solids:
+            if rect.colliderect(obj):
+                # kwam van links
+                if prev_right <= obj.left:
+                    rect.right = obj.left
+                # kwam van rechts
+                elif prev_left >= obj.right:
+                    rect.left = obj.right
+
+    # platform / obstacle landing with a tolerant foot check so landing is reliable
+    landed = False
+    if player.vel_y >= 0:
+        feet = world.feet
+        feet.update(rect.left + 6, prev_bottom - 4, rect.width - 12, 6)
+        i = feet.collidelist(solids)
+        if i != -1 and over_hole:
+            # ground platforms don't hold the player while over a hole: look for another hit
+            is_ground = world.solid_is_ground
+            i = -1
+            for j, obj in enumerate(solids):
+                if not is_ground[j] and feet.colliderect(obj):
+                    i = j
+                    break
+        if i != -1:
+            rect.bottom = solids[i].top
+            player.vel_y = 0
+            player.on_ground = True
+            landed = True
+
+    # ground (don't land if over a hole)
+    if not landed:
+        if not over_hole:
+            if rect.bottom >= GROUND_Y:
+                rect.bottom = GROUND_Y
+                player.vel_y = 0
+                player.on_ground = True
+        else:
+            # over a hole: ensure player is not considered on_ground so they fall
+            player.on_ground = False
+            # death occurs after falling off-screen so the fall is visible
+            if rect.top > HEIGHT:
+                lose_egg(world, 28)
+                player.eggs = 0
+                world.game_over = True
+
+
+def machine_system(world, dt):
+    """Machines shoot on their timers; projectiles move and leave the world."""
+    now = world.time_ms
+    m_x, m_y, m_dir, m_last = world.m_x, world.m_y, world.m_dir, world.m_last_shot
+    m_interval, m_speed = world.m_interval, world.m_speed
+    rng = world.rng
+    half = MACHINE_SIZE // 2
+    for i in range(len(m_x)):
+        if now - m_last[i] >= m_interval[i]:
+            # shoot vertically with the configured speed, a bit variable
+            speed = 6.0 + rng.random() * 0.6
+            d = m_dir[i]
+            world.spawn_projectile(m_x[i] + half, m_y[i] + half + d * 20, 0.0, m_speed[i] * speed * d)
+            m_last[i] = now
+
+    p_x, p_y, p_vx, p_vy = world.p_x, world.p_y, world.p_vx, world.p_vy
+    right = world.width + 50
+    bottom = HEIGHT + 200
+    i = 0
+    while i < world.p_count:
+        x = p_x[i] + int(p_vx[i] * dt)
+        y = p_y[i] + int(p_vy[i] * dt)
+        # remove projectiles that are off the world horizontally or off-screen vertically
+        if -50 < x < right and -200 < y < bottom:
+            p_x[i] = x
+            p_y[i] = y
+            i += 1
+        else:
+            world.remove_projectile(i)
+
+
+def hazard_system(world):
+    """Projectile hits, finish flag, spikes, death zones and jump pads."""
+    player = world.player
+    rect = player.rect
+    now = world.time_ms
+    # use a slightly smaller hitbox to avoid early triggers
+    hb = world.hitbox
+    hb.update(rect.x + 3, rect.y + 3, rect.width - 6, rect.height - 6)
+    hl, ht, hr, hbt = hb.left, hb.top, hb.right, hb.bottom
+
+    # projectiles, also with a hitbox shrunk by 3 px per side
+    inner = PROJECTILE_SIZE - 3
+    p_x, p_y = world.p_x, world.p_y
+    i = 0
+    while i < world.p_count:
+        x = p_x[i]
+        y = p_y[i]
+        if x + 3 < hr and x + inner > hl and y + 3 < hbt and y + inner > ht and player.hit(now):
+            lose_egg(world)
+            world.remove_projectile(i)
+        else:
+            i += 1
+
+    # check finish flag
+    if world.finish and rect.colliderect(world.finish):
+        advance_level(world)
+
+    # spikes cost an egg (smaller hitbox)
+    if hb.collidelist(world.spikes) != -1 and player.hit(now):
+        lose_egg(world)
+        if player.eggs <= 0:
+            world.game_over = True
+    if world.death_zones and rect.collidelist(world.death_zones) != -1:
+        player.eggs = 0
+        world.game_over = True
+
+    # jump pads bounce, only when landing onto the pad
+    if player.vel_y >= 0 and rect.collidelist(world.jump_pads) != -1:
+        for jp in world.jump_pads:
+            if rect.colliderect(jp) and world.prev_bottom <= jp.top:
+                player.vel_y = -JUMP_POWER * 1.8
+                player.on_ground = True
+
+
+def effects_system(world, dt):
+    """Move and fade egg-loss particles."""
+    e_x, e_y, e_vx, e_vy, e_life = world.e_x, world.e_y, world.e_vx, world.e_vy, world.e_life
+    fall = GRAVITY * 0.15
+    fade = 0.04 * dt
+    i = 0
+    while i < world.e_count:
+        e_x[i] += e_vx[i] * dt * 6
+        e_y[i] += e_vy[i] * dt * 6
+        e_vy[i] += fall
+        e_life[i] -= fade
+        if e_life[i] <= 0:
+            world.remove_effect(i)
+        else:
+            i += 1
+
+
+def step(world, bits, ms, probe=None):
+    """Advance the simulation by one frame of `ms` milliseconds with input `bits`.
+
+    `probe`, if given, gets probe.begin(name) / probe.end(name) around each
+    system (used by alloc_budget.py to measure the phases separately).
+    """
+    dt = ms / 16.0  # normalize movement scale
+    world.time_ms += ms
+    world.frame += 1
+    if bits & IN_RESTART and (world.game_over or world.win):
+        # restart after finishing or game over
+        restart(world)
+
+    was_over = world.game_over
+    if not world.game_over and not world.win:
+        if probe is None:
+            physics_system(world, bits, ms)
+            machine_system(world, dt)
+            hazard_system(world)
+        else:
+            probe.begin('physics')
+            physics_system(world, bits, ms)
+            probe.end('physics')
+            probe.begin('machines')
+            machine_system(world, dt)
+            probe.end('machines')
+            probe.begin('hazards')
+            hazard_system(world)
+            probe.end('hazards')
+        player = world.player
+        # camera follows player but clamped
+        world.camera_x = max(0, min(player.rect.x - 200, world.width - WIDTH))
+        if world.regions is not None:
+            # stream level regions in and out around the camera
+            world.regions.update(world)
+        if player.eggs <= 0:
+            world.game_over = True
+    if world.game_over and not was_over:
+        world.deaths += 1
+    if probe is None:
+        effects_system(world, dt)
+    else:
+        probe.begin('effects')
+        effects_system(world, dt)
+        probe.end('effects')
+
+
+# --- PROTOTYPE (main.py) ---
+# main.py moves differently from the game (slower, sprint instead of float, its
+# own gravity and no holes), so it has its own system instead of physics_system.
+PROTO_SPEED = 3
+PROTO_GRAVITY = 0.5
+PROTO_JUMP = -14
+
+
+def prototype_physics_system(world, bits):
+    """Movement of the main.py prototype: walk/sprint, jump off a platform and walls.
+
+    The player's height is the float `player.y_f` (the centre of the hitbox);
+    the hitbox is put back on it every frame, like the prototype did, so a
+    landing only moves the hitbox and not the position.
+    """
+    player = world.player
+    rect = player.rect
+    # BEWEGEN- LINKS/RECHTS (shift = sprinten)
+    speed = PROTO_SPEED * 2 if bits & IN_FLOAT else PROTO_SPEED
+    if bits & IN_LEFT:
+        rect.x -= speed
+    if bits & IN_RIGHT:
+        rect.x += speed
+    # SPRINGEN
+    if bits & IN_JUMP:
+        for ground in world.platforms:
+            if rect.bottom >= ground.top:
+                player.vel_y = PROTO_JUMP
+                break
+    # ZWAARTEKRACHT
+    if not player.on_ground:
+        player.vel_y += PROTO_GRAVITY
+        player.y_f += player.vel_y
+
+    # HITBOX UPDATEN
+    rect.centery = player.y_f
+
+    # COLLISION MET DE GROND
+    i = rect.collidelist(world.platforms)
+    if i != -1:
+        ground = world.platforms[i]
+        player.on_ground = True
+        if player.vel_y > 0:   # valt omlaag
+            rect.bottom = ground.top
+            player.vel_y = 0
+        elif player.vel_y < 0:  # springt omhoog
+            player.on_ground = False
+            rect.top = ground.bottom
+            player.vel_y = 0
+    else:
+        player.on_ground = False
+
+    # COLLISION MET DE MUUR
+    for wall in world.obstacles:
+        if rect.colliderect(wall):
+            if rect.right > wall.left and rect.left < wall.left:
+                rect.right = wall.left
+            elif rect.left < wall.right and rect.right > wall.right:
+                rect.left = wall.right
+
+
+# --- RENDERING ---
+def render_system(world, screen, renderer, ghosts=None):
+    """Draw the world (not the HUD) as a handful of batched layers, culled to the camera window.
+
+    `ghosts` is an optional GhostClient whose view_x / view_y / count hold the
+    other players to draw behind the player.
+    """
+    sprites = renderer.sprites
+    stats = renderer.stats
+    camera_x = world.camera_x
+    view_left = camera_x
+    view_right = camera_x + screen.get_width()
+
+    bg = renderer.background(view_right - view_left)
+    if bg:
+        screen.blit(bg, (-(camera_x % renderer.bg_tile), 0))
+    else:
+        screen.fill((153, 211, 232))
+    stats.count()
+
+    # terrain: obstacles and platforms (already split around holes by World.rebuild).
+    # Filled, not blitted: streamed levels cut them to a new width at every
+    # region edge, and a cached sprite per width would keep growing.
+    dest = renderer.scratch
+    for r, kind in world.terrain:
+        if r.right >= view_left and r.left <= view_right:
+            dest.update(r.x - camera_x, r.y, r.width, r.height)
+            screen.fill(PLATFORM_COLOR if kind == PLATFORM else OBSTACLE_COLOR, dest)
+            stats.count()
+
+    # hazards: spike strips, jump pads and the finish flag
+    layer = renderer.hazard_layer
+    for s in world.spikes:
+        if s.right + s.width >= view_left and s.left <= view_right:
+            layer.add(sprites.spikes(s.width, s.height), s.x - camera_x, s.y)
+    for jp in world.jump_pads:
+        if jp.right >= view_left and jp.left <= view_right:
+            layer.add(sprites.pad(jp.width, jp.height), jp.x - camera_x, jp.y)
+    fr = world.finish
+    if fr and fr.right + 8 >= view_left and fr.left <= view_right:
+        # enhanced flag pole (taller) and a waving banner for visibility
+        layer.add(sprites.flag(fr.width, fr.height, flag_offset(world.time_ms)), fr.x - camera_x, fr.y)
+    layer.flush(screen)
+
+    # machines and their projectiles
+    layer = renderer.machine_layer
+    m_x, m_y, m_dir = world.m_x, world.m_y, world.m_dir
+    for i in range(len(m_x)):
+        x = m_x[i]
+        if x + MACHINE_SIZE + 24 >= view_left and x - 24 <= view_right:
+            # draw machine sprite if available (flipped when shooting up)
+            img = renderer.machine_image(m_dir[i])
+            if img:
+                layer.add_surface(img, x - camera_x, m_y[i])
+            else:
+                layer.add(sprites.machine(MACHINE_SIZE, MACHINE_SIZE, m_dir[i]), x - camera_x, m_y[i])
+    proj = sprites.projectile(PROJECTILE_SIZE, PROJECTILE_SIZE)
+    p_x, p_y = world.p_x, world.p_y
+    for i in range(world.p_count):
+        x = p_x[i]
+        if x + PROJECTILE_SIZE >= view_left and x <= view_right:
+            layer.add(proj, x - camera_x, p_y[i])
+    layer.flush(screen)
+
+    player = world.player
+    if ghosts is not None and ghosts.count:
+        layer = renderer.ghost_layer
+        img = renderer.ghost_image(player.rect.width, player.rect.height)
+        g_x, g_y = ghosts.view_x, ghosts.view_y
+        for i in range(ghosts.count):
+            x = g_x[i]
+            if x + player.rect.width >= view_left and x <= view_right:
+                layer.add_surface(img, x - camera_x, g_y[i])
+        layer.flush(screen)
+
+    # draw player (adjusted by camera)
+    if renderer.player_img:
+        screen.blit(renderer.player_img, (player.rect.x - camera_x, player.rect.y))
+        stats.count()
+    else:
+        # flashing when invincible
+        now = world.time_ms
+        if not (now < player.invincible_until and (now // 120) % 2 == 0):
+            r = renderer.scratch
+            r.update(player.rect.x - camera_x, player.rect.y, player.rect.width, player.rect.height)
+            screen.fill((255, 220, 180), r)
+            stats.count()
+
+    # particle effects (egg loss), fading by shrinking
+    layer = renderer.effect_layer
+    e_x, e_y, e_life, e_r = world.e_x, world.e_y, world.e_life, world.e_r
+    for i in range(world.e_count):
+        r = max(1, int(e_r[i] * max(0.2, e_life[i])))
+        layer.add(sprites.particle(r, EFFECT_COLOR), int(e_x[i] - camera_x), int(e_y[i]))
+    layer.flush(screen)
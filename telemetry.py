@@ -0,0 +1,324 @@
+"""Per-frame telemetry in a memory-mapped ring file, for long unattended runs.
+
+Real.py --telemetry FILE writes one fixed-size record per frame: frame time,
+entity counts, deaths and level progress. The file is memory-mapped and the
+records are packed straight into the map, so writing is a handful of stores
+into memory: no system call, no waiting on the disk and no new objects (the
+OS writes the pages back in the background). When the ring is full the oldest
+records are overwritten; the header keeps the total number written.
+
+The same module reads the file, also while the game is running:
+
+    python telemetry.py tail run.tlm -f        # follow new records
+    python telemetry.py stats run.tlm          # frame time percentiles, deaths, progress per level
+    python telemetry.py plot run.tlm --out run.png   # needs matplotlib, text charts otherwise
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from collections import namedtuple
+
+MAGIC = b'SRTL'
+VERSION = 1
+# magic, version, record size, capacity, wall clock time when the file was created
+HEADER = struct.Struct('<4sHHId')
+# total number of records written, updated after every record
+COUNT = struct.Struct('<Q')
+COUNT_AT = HEADER.size
+DATA_AT = 64
+# frame, sim time (ms), frame time (ms), update + draw time (ms), entities, projectiles, particles,
+# deaths, level, eggs, flags, player x, level width
+RECORD = struct.Struct('<IIHHHHHHBbBxiI')
+FIELDS = ('frame', 't_ms', 'frame_ms', 'work_ms', 'entities', 'projectiles', 'effects',
+          'deaths', 'level', 'eggs', 'flags', 'x', 'width')
+Sample = namedtuple('Sample', FIELDS)
+
+# flags
+SKIPPED = 1     # the pacer skipped drawing this frame
+GAME_OVER = 2
+WIN = 4
+
+# an hour at 60 FPS
+DEFAULT_CAPACITY = 60 * 60 * 60
+
+
+class TelemetryWriter:
+    """Appends one record per frame to a ring file. The file is created new (a reader keeps the old one)."""
+
+    def __init__(self, path, capacity=DEFAULT_CAPACITY):
+        self.path = str(path)
+        self.capacity = capacity
+        self.count = 0
+        size = DATA_AT + capacity * RECORD.size
+        tmp = self.path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, RECORD.size, capacity, time.time()))
+            # write the whole file up front so no disk blocks are allocated while playing
+            chunk = bytes(1 << 20)
+            left = size - HEADER.size
+            while left > 0:
+                f.write(chunk[:left])
+                left -= len(chunk)
+        os.replace(tmp, self.path)
+        self._file = open(self.path, 'r+b')
+        self._map = mmap.mmap(self._file.fileno(), size)
+
+    def write(self, world, frame_ms, work_ms, skipped=False):
+        """Record the state of `world` after a frame that took `frame_ms` (of which `work_ms` update + draw)."""
+        n = self.count
+        flags = SKIPPED if skipped else 0
+        if world.game_over:
+            flags |= GAME_OVER
+        if world.win:
+            flags |= WIN
+        if frame_ms > 0xFFFF:
+            frame_ms = 0xFFFF
+        if work_ms > 0xFFFF:
+            work_ms = 0xFFFF
+        player = world.player
+        RECORD.pack_into(self._map, DATA_AT + (n % self.capacity) * RECORD.size,
+                         world.frame & 0xFFFFFFFF, world.time_ms & 0xFFFFFFFF, frame_ms, work_ms,
+                         world.entity_count(), world.p_count, world.e_count, world.deaths & 0xFFFF,
+                         world.level & 0xFF, player.eggs, flags, player.rect.x, world.width)
+        # the count goes last, so a reader never sees a record that is half written
+        self.count = n + 1
+        COUNT.pack_into(self._map, COUNT_AT, n + 1)
+
+    def close(self):
+        self._map.flush()
+        self._map.close()
+        self._file.close()
+
+
+class TelemetryReader:
+    """Reads the records of a ring file; safe to use while a game is writing it."""
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, 'rb')
+        self.inode = os.fstat(self._file.fileno()).st_ino
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, record_size, self.capacity, self.started = HEADER.unpack_from(self._map, 0)
+        except (ValueError, struct.error):
+            self._file.close()
+            raise ValueError(f"{self.path} is not a telemetry file")
+        if magic != MAGIC or version != VERSION or record_size != RECORD.size:
+            self.close()
+            raise ValueError(f"{self.path} is not a telemetry file (version {VERSION})")
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def replaced(self):
+        """True when a new game run has started a new file at the same path."""
+        try:
+            return os.stat(self.path).st_ino != self.inode
+        except OSError:
+            return False
+
+    def count(self):
+        return COUNT.unpack_from(self._map, COUNT_AT)[0]
+
+    def read(self, since=0):
+        """Records written after the first `since`, oldest first, as far as they are still in the ring.
+
+        Returns (samples, count); pass count as `since` next time to get only the new ones.
+        """
+        end = self.count()
+        start = max(since, end - self.capacity)
+        samples = [Sample._make(RECORD.unpack_from(self._map, DATA_AT + (i % self.capacity) * RECORD.size))
+                   for i in range(start, end)]
+        # the writer may have come round and overwritten the oldest ones while we read
+        overwritten = self.count() - self.capacity
+        if overwritten > start:
+            del samples[:overwritten - start]
+        return samples, end
+
+
+# --- READER TOOL ---
+def format_sample(s):
+    state = 'skip' if s.flags & SKIPPED else ''
+    if s.flags & GAME_OVER:
+        state += ' over'
+    if s.flags & WIN:
+        state += ' win'
+    return (f"{s.frame:>8} {s.t_ms / 1000:>9.2f} {s.frame_ms:>4} {s.work_ms:>4} {s.entities:>5} {s.projectiles:>4} "
+            f"{s.deaths:>6} {s.level:>3} {s.eggs:>4} {s.x:>7}/{s.width:<7} {progress(s):>5.1f}% {state}")
+
+
+TAIL_HEADER = (f"{'frame':>8} {'time s':>9} {'ms':>4} {'work':>4} {'ents':>5} {'proj':>4} "
+               f"{'deaths':>6} {'lvl':>3} {'eggs':>4} {'x/width':>15} {'prog':>6}")
+
+
+def progress(s):
+    return 100.0 * s.x / s.width if s.width else 0.0
+
+
+def percentile(values, p):
+    if not values:
+        return 0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def select(samples, last_s):
+    """The samples of the last `last_s` seconds of game time (all when None)."""
+    if last_s is None or not samples:
+        return samples
+    cutoff = samples[-1].t_ms - last_s * 1000
+    return [s for s in samples if s.t_ms >= cutoff]
+
+
+def tail(path, lines, follow):
+    # when following, the game may not have started yet
+    while follow and not os.path.exists(path):
+        time.sleep(0.2)
+    reader = TelemetryReader(path)
+    samples, seen = reader.read()
+    print(TAIL_HEADER)
+    for s in samples[-lines:]:
+        print(format_sample(s))
+    while follow:
+        try:
+            time.sleep(0.2)
+        except KeyboardInterrupt:
+            break
+        if reader.replaced():
+            reader.close()
+            reader = TelemetryReader(path)
+            seen = 0
+            print("-- new run --")
+        samples, seen = reader.read(seen)
+        for s in samples:
+            print(format_sample(s))
+    reader.close()
+
+
+def stats(samples, budget_ms):
+    """Aggregate numbers for a list of samples, as lines of text."""
+    if not samples:
+        return ["no records"]
+    first, last = samples[0], samples[-1]
+    frame_ms = [s.frame_ms for s in samples]
+    work_ms = [s.work_ms for s in samples]
+    skipped = sum(1 for s in samples if s.flags & SKIPPED)
+    hitches = sum(1 for ms in frame_ms if ms > budget_ms * 2)
+    seconds = (last.t_ms - first.t_ms) / 1000.0
+    lines = [
+        f"records: {len(samples)} (frames {first.frame}..{last.frame}), {seconds:.1f} s of game time",
+        f"frame time: mean {sum(frame_ms) / len(frame_ms):.1f} ms, p50 {percentile(frame_ms, 0.5)}, "
+        f"p95 {percentile(frame_ms, 0.95)}, p99 {percentile(frame_ms, 0.99)}, max {max(frame_ms)}",
+        f"update + draw: mean {sum(work_ms) / len(work_ms):.1f} ms, p99 {percentile(work_ms, 0.99)}, max {max(work_ms)}",
+        f"hitches (over {budget_ms * 2:.0f} ms): {hitches}, frames not drawn: {skipped} ({100.0 * skipped / len(samples):.1f}%)",
+        f"entities: mean {sum(s.entities for s in samples) / len(samples):.0f}, max {max(s.entities for s in samples)}, "
+        f"projectiles max {max(s.projectiles for s in samples)}",
+        f"deaths: {last.deaths - first.deaths}" + (f" ({60.0 * (last.deaths - first.deaths) / seconds:.1f} per minute)" if seconds else ""),
+        f"{'level':>5} {'frames':>8} {'deaths':>7} {'best progress':>14}",
+    ]
+    levels = {}
+    prev = first
+    for s in samples:
+        row = levels.setdefault(s.level, [0, 0, 0.0])
+        row[0] += 1
+        row[1] += s.deaths - prev.deaths
+        row[2] = max(row[2], progress(s))
+        prev = s
+    for level in sorted(levels):
+        frames, deaths, best = levels[level]
+        lines.append(f"{level:>5} {frames:>8} {deaths:>7} {best:>13.1f}%")
+    return lines
+
+
+SPARKS = ' ▁▂▃▄▅▆▇█'
+
+
+def sparkline(values, width):
+    """Max per bucket as one line of block characters."""
+    buckets = [max(values[i * len(values) // width:(i + 1) * len(values) // width] or [0]) for i in range(width)]
+    top = max(buckets) or 1
+    return ''.join(SPARKS[int(v * (len(SPARKS) - 1) / top)] for v in buckets), top
+
+
+def plot(samples, out, width=72):
+    if not samples:
+        print("no records")
+        return
+    try:
+        import matplotlib
+        if out:
+            matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+    except ImportError:
+        plt = None
+    t = [s.t_ms / 1000.0 for s in samples]
+    if plt is None:
+        if out:
+            print("matplotlib is not installed; showing text charts instead", file=sys.stderr)
+        for label, values in (('frame ms', [s.frame_ms for s in samples]),
+                              ('work ms', [s.work_ms for s in samples]),
+                              ('entities', [s.entities for s in samples]),
+                              ('progress', [progress(s) for s in samples]),
+                              ('deaths', [s.deaths - samples[0].deaths for s in samples])):
+            line, top = sparkline(values, min(width, len(values)))
+            print(f"{label:>9} |{line}| max {top:.0f}")
+        print(f"{'':>9}  {t[0]:.0f} s .. {t[-1]:.0f} s")
+        return
+    fig, (ax1, ax2, ax3) = plt.subplots(3, 1, sharex=True, figsize=(10, 7))
+    ax1.plot(t, [s.frame_ms for s in samples], lw=0.6, label='frame')
+    ax1.plot(t, [s.work_ms for s in samples], lw=0.6, label='update + draw')
+    ax1.set_ylabel('ms')
+    ax1.legend(loc='upper right')
+    ax2.plot(t, [s.entities for s in samples], lw=0.6)
+    ax2.set_ylabel('entities')
+    ax3.plot(t, [progress(s) for s in samples], lw=0.6)
+    ax3.set_ylabel('level progress %')
+    ax3.set_xlabel('game time (s)')
+    for i in range(1, len(samples)):
+        if samples[i].deaths != samples[i - 1].deaths:
+            for ax in (ax1, ax2, ax3):
+                ax.axvline(t[i], color='red', lw=0.5, alpha=0.5)
+    fig.tight_layout()
+    if out:
+        fig.savefig(out, dpi=120)
+        print(f"wrote {out}")
+    else:
+        plt.show()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('tail', help='print the latest records')
+    p.add_argument('file')
+    p.add_argument('-n', '--lines', type=int, default=20)
+    p.add_argument('-f', '--follow', action='store_true', help='keep printing new records')
+    for name, text in (('stats', 'frame time, entity, death and progress summary'), ('plot', 'chart the records')):
+        p = sub.add_parser(name, help=text)
+        p.add_argument('file')
+        p.add_argument('--last', type=float, metavar='SECONDS', help='only the last SECONDS of game time')
+        if name == 'stats':
+            p.add_argument('--fps', type=int, default=60, help='target frame rate (for counting hitches)')
+        else:
+            p.add_argument('--out', metavar='PNG', help='save the chart instead of showing it')
+    args = parser.parse_args(argv)
+
+    if args.command == 'tail':
+        tail(args.file, args.lines, args.follow)
+        return 0
+    reader = TelemetryReader(args.file)
+    samples = select(reader.read()[0], args.last)
+    reader.close()
+    if args.command == 'stats':
+        print('\n'.join(stats(samples, 1000.0 / args.fps)))
+    else:
+        plot(samples, args.out)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,400 @@
+import json
+import random
+from array import array
+from pathlib import Path
+
+import pygame
+
+# --- CONSTANTS ---
+WIDTH, HEIGHT = 900, 500
+GROUND_Y = HEIGHT - 50
+PLAYER_SPEED = 5
+JUMP_POWER = 14
+GRAVITY = 0.8
+INVINCIBILITY_MS = 1000
+MAX_FLOAT_MS = 500
+MACHINE_SIZE = 48
+PROJECTILE_SIZE = 16
+LEVELS_DIR = Path(__file__).parent / 'levels'
+
+# entity kinds for the static component arrays
+PLATFORM = 0
+OBSTACLE = 1
+HOLE = 2
+SPIKE = 3
+JUMP_PAD = 4
+FINISH = 5
+CHECKPOINT = 6
+DEATH_ZONE = 7
+PROP = 8
+KIND_NAMES = ('platform', 'obstacle', 'hole', 'spike', 'jump_pad', 'finish', 'checkpoint', 'death_zone', 'prop')
+
+# input bits, one byte per frame (also what replays and ghosts store)
+IN_LEFT = 1
+IN_RIGHT = 2
+IN_JUMP = 4
+IN_FLOAT = 8
+IN_RESTART = 16
+
+
+def read_input(keys):
+    """Turn pygame.key.get_pressed() into input bits. Arrow keys and WASD support."""
+    bits = 0
+    if keys[pygame.K_LEFT] or keys[pygame.K_a]:
+        bits |= IN_LEFT
+    if keys[pygame.K_RIGHT] or keys[pygame.K_d]:
+        bits |= IN_RIGHT
+    if keys[pygame.K_SPACE] or keys[pygame.K_UP] or keys[pygame.K_w]:
+        bits |= IN_JUMP
+    if keys[pygame.K_LSHIFT] or keys[pygame.K_RSHIFT]:
+        bits |= IN_FLOAT
+    return bits
+
+
+class Player:
+    """Player component: the one entity that is controlled by input."""
+    # y_f: float height of the hitbox centre, only used by the main.py prototype
+    __slots__ = ('rect', 'vel_y', 'on_ground', 'eggs', 'invincible_until', 'score', 'float_timer', 'is_floating',
+                 'y_f')
+
+    def __init__(self, x=50, y=GROUND_Y - 48):
+        self.rect = pygame.Rect(x, y, 48, 48)
+        self.reset()
+        self.rect.topleft = (x, y)
+
+    def reset(self):
+        self.rect.topleft = (50, GROUND_Y - self.rect.height)
+        self.vel_y = 0
+        self.on_ground = False
+        self.eggs = 3
+        self.invincible_until = 0
+        self.score = 0
+        self.float_timer = 0
+        self.is_floating = False
+        self.y_f = float(self.rect.centery)
+
+    def respawn(self, now):
+        """Respawn the player at the start without resetting eggs or score."""
+        self.rect.topleft = (50, GROUND_Y - self.rect.height)
+        self.vel_y = 0
+        self.on_ground = False
+        # give a short invincibility after respawn
+        self.invincible_until = now + INVINCIBILITY_MS
+
+    def hit(self, now):
+        if now >= self.invincible_until:
+            self.eggs -= 1
+            self.invincible_until = now + INVINCIBILITY_MS
+            return True
+        return False
+
+
+class World:
+    """All level and entity state, stored as typed component arrays.
+
+    Static geometry (platforms, holes, spikes, ...) is one row per entity in
+    kind/x/y/w/h. Machines, projectiles and particles have their own arrays;
+    projectiles and particles are pools with a live count and swap-remove, so
+    the arrays are reused instead of rebuilt every frame.
+
+    The per-kind Rect lists (solids, holes, spikes, ...) are read-only views
+    for pygame's C collision and draw routines. They are rebuilt by rebuild()
+    whenever the static arrays change.
+    """
+
+    def __init__(self, seed=None):
+        self.rng = random.Random(seed)
+        self.width = WIDTH
+        self.level = 1
+        # simulation clock in ms, advanced by step(); used instead of pygame.time.get_ticks()
+        self.time_ms = 0
+        self.frame = 0
+        self.camera_x = 0
+        self.game_over = False
+        self.win = False
+        self.final_victory = False
+        self.deaths = 0
+        # RegionStreamer when the level is streamed from a region file (see regions.py)
+        self.regions = None
+        self.player = Player()
+        self.prev_bottom = self.player.rect.bottom
+
+        # static entities
+        self.kind = array('B')
+        self.x = array('i')
+        self.y = array('i')
+        self.w = array('i')
+        self.h = array('i')
+
+        # machines: position, direction (1 = down, -1 = up), timers
+        self.m_x = array('i')
+        self.m_y = array('i')
+        self.m_dir = array('b')
+        self.m_interval = array('i')
+        self.m_last_shot = array('q')
+        self.m_speed = array('d')
+
+        # projectile pool
+        self.p_count = 0
+        self.p_x = array('i')
+        self.p_y = array('i')
+        self.p_vx = array('d')
+        self.p_vy = array('d')
+
+        # particle pool (egg loss effect)
+        self.e_count = 0
+        self.e_x = array('d')
+        self.e_y = array('d')
+        self.e_vx = array('d')
+        self.e_vy = array('d')
+        self.e_life = array('d')
+        self.e_r = array('i')
+
+        # views, filled by rebuild()
+        self.platforms = []
+        self.obstacles = []
+        self.solids = []
+        self.solid_is_ground = []
+        self.holes = []
+        self.spikes = []
+        self.jump_pads = []
+        self.checkpoints = []
+        self.death_zones = []
+        self.props = []
+        self.finish = None
+        # terrain pieces for drawing: platforms split around holes, as (Rect, kind)
+        self.terrain = []
+        # scratch rects reused by the systems every frame
+        self.feet = pygame.Rect(0, 0, 0, 0)
+        self.hitbox = pygame.Rect(0, 0, 0, 0)
+
+    # --- building ---
+    def clear(self):
+        for arr in (self.kind, self.x, self.y, self.w, self.h,
+                    self.m_x, self.m_y, self.m_dir, self.m_interval, self.m_last_shot, self.m_speed):
+            del arr[:]
+        self.p_count = 0
+        self.e_count = 0
+
+    def add(self, kind, x, y, w, h):
+        self.kind.append(kind)
+        self.x.append(int(x))
+        self.y.append(int(y))
+        self.w.append(int(w))
+        self.h.append(int(h))
+        return len(self.kind) - 1
+
+    def add_machine(self, x, y, direction=1, shoot_interval=2000, projectile_speed=3.0):
+        self.m_x.append(int(x))
+        self.m_y.append(int(y))
+        self.m_dir.append(int(direction))
+        self.m_interval.append(int(shoot_interval))
+        self.m_last_shot.append(self.time_ms - self.rng.randint(0, int(shoot_interval)))
+        self.m_speed.append(float(projectile_speed))
+        return len(self.m_x) - 1
+
+    def rebuild(self):
+        """Refresh the Rect views after the static arrays changed."""
+        views = {k: [] for k in range(len(KIND_NAMES))}
+        kind, xs, ys, ws, hs = self.kind, self.x, self.y, self.w, self.h
+        for i in range(len(kind)):
+            views[kind[i]].append(pygame.Rect(xs[i], ys[i], ws[i], hs[i]))
+        self.platforms = views[PLATFORM]
+        self.obstacles = views[OBSTACLE]
+        self.solids = self.platforms + self.obstacles
+        # ground platforms are not landed on while the player is over a hole
+        n_platforms = len(self.platforms)
+        self.solid_is_ground = [i < n_platforms and r.y >= GROUND_Y - 4 for i, r in enumerate(self.solids)]
+        self.holes = views[HOLE]
+        self.spikes = views[SPIKE]
+        self.jump_pads = views[JUMP_PAD]
+        self.checkpoints = views[CHECKPOINT]
+        self.death_zones = views[DEATH_ZONE]
+        self.props = views[PROP]
+        self.finish = views[FINISH][0] if views[FINISH] else None
+        self.terrain = [(r, OBSTACLE) for r in self.obstacles if r.width > 0 and r.height > 0]
+        for plat in self.platforms:
+            # split platform horizontally by holes that intersect it
+            inter_holes = [h for h in self.holes if h.y <= plat.y + plat.height and (h.left < plat.right and h.right > plat.left)]
+            inter_holes.sort(key=lambda hh: hh.x)
+            cur = plat.left
+            for h in inter_holes:
+                hx = max(h.left, plat.left)
+                if hx > cur:
+                    self.terrain.append((pygame.Rect(cur, plat.y, hx - cur, plat.height), PLATFORM))
+                cur = max(cur, min(plat.right, h.right))
+            # final segment
+            if cur < plat.right:
+                self.terrain.append((pygame.Rect(cur, plat.y, plat.right - cur, plat.height), PLATFORM))
+
+    # --- pools ---
+    def spawn_projectile(self, x, y, vx, vy):
+        i = self.p_count
+        if i == len(self.p_x):
+            self.p_x.append(0)
+            self.p_y.append(0)
+            self.p_vx.append(0.0)
+            self.p_vy.append(0.0)
+        self.p_x[i] = int(x)
+        self.p_y[i] = int(y)
+        self.p_vx[i] = vx
+        self.p_vy[i] = vy
+        self.p_count = i + 1
+
+    def remove_projectile(self, i):
+        last = self.p_count - 1
+        if i != last:
+            self.p_x[i] = self.p_x[last]
+            self.p_y[i] = self.p_y[last]
+            self.p_vx[i] = self.p_vx[last]
+            self.p_vy[i] = self.p_vy[last]
+        self.p_count = last
+
+    def spawn_effect(self, x, y, vx, vy, life, r):
+        i = self.e_count
+        if i == len(self.e_x):
+            for arr in (self.e_x, self.e_y, self.e_vx, self.e_vy, self.e_life):
+                arr.append(0.0)
+            self.e_r.append(0)
+        self.e_x[i] = x
+        self.e_y[i] = y
+        self.e_vx[i] = vx
+        self.e_vy[i] = vy
+        self.e_life[i] = life
+        self.e_r[i] = r
+        self.e_count = i + 1
+
+    def remove_effect(self, i):
+        last = self.e_count - 1
+        if i != last:
+            self.e_x[i] = self.e_x[last]
+            self.e_y[i] = self.e_y[last]
+            self.e_vx[i] = self.e_vx[last]
+            self.e_vy[i] = self.e_vy[last]
+            self.e_life[i] = self.e_life[last]
+            self.e_r[i] = self.e_r[last]
+        self.e_count = last
+
+    def entity_count(self):
+        return len(self.kind) + len(self.m_x) + self.p_count + self.e_count + 1
+
+
+# --- LEVELS ---
+def level_count():
+    return len({p.stem for p in LEVELS_DIR.glob('level*.*') if p.is_file() and p.suffix in ('.json', '.rgn')})
+
+
+def build_level(world, lv):
+    """Fill `world` with level `lv`: streamed from levels/level<lv>.rgn, from levels/level<lv>.json,
+    or generated if those are missing or broken."""
+    world.level = lv
+    if world.regions is not None:
+        world.regions.close()
+        world.regions = None
+    rgn_path = LEVELS_DIR / f'level{lv}.rgn'
+    if rgn_path.exists():
+        streamer = None
+        try:
+            # imported here because regions.py imports this module
+            from regions import RegionStreamer
+            streamer = RegionStreamer(rgn_path)
+            streamer.attach(world)
+            return
+        except Exception:
+            # close the file and map; the fallbacks below clear the world again
+            if streamer is not None:
+                streamer.close()
+            world.regions = None
+    json_path = LEVELS_DIR / f'level{lv}.json'
+    if json_path.exists():
+        try:
+            with open(json_path, 'r', encoding='utf8') as f:
+                data = json.load(f)
+            load_json_level(world, data)
+            world.rebuild()
+            return
+        except Exception:
+            # fall back to procedural generation on any load error
+            pass
+    _generate_level(world, lv)
+    world.rebuild()
+
+
+def load_json_level(world, data):
+    """Fill `world` (not rebuilt) from the parsed JSON of a level file."""
+    world.clear()
+    world.width = int(data.get('world_width', 1600))
+    for kind, key in ((PLATFORM, 'platforms'), (OBSTACLE, 'obstacles'), (HOLE, 'holes'),
+                      (SPIKE, 'spikes'), (JUMP_PAD, 'jump_pads'), (CHECKPOINT, 'checkpoints')):
+        default = [[0, GROUND_Y, world.width, 50]] if kind == PLATFORM else []
+        for r in data.get(key, default):
+            world.add(kind, *r)
+    for m in data.get('machines', []):
+        world.add_machine(int(m.get('x')), int(m.get('y')),
+                          direction=int(m.get('direction', 1)),
+                          shoot_interval=int(m.get('shoot_interval', 1800)),
+                          projectile_speed=float(m.get('projectile_speed', 3.0)))
+    fx = int(data.get('finish_x', world.width - 80))
+    world.add(FINISH, fx, GROUND_Y - 120, 40, 120)
+    if not data.get('checkpoints'):
+        # default checkpoint at 20% of the level
+        world.add(CHECKPOINT, max(50, int(world.width * 0.2)), GROUND_Y - 40, 24, 40)
+
+
+def _generate_level(world, lv):
+    """Procedural fallback if no JSON level."""
+    rng = world.rng
+    world.clear()
+    world.width = 1600 + (lv - 1) * 600
+    # ground platform across the whole world
+    world.add(PLATFORM, 0, GROUND_Y, world.width, 50)
+    # create some obstacles; spacing and heights vary with level
+    seed_x = 280
+    for i in range(5 + lv // 2):
+        w = rng.randint(80, 180)
+        h_off = rng.choice([80, 100, 140, 160])
+        world.add(OBSTACLE, seed_x + i * 260, GROUND_Y - h_off, w, 16)
+        # ensure reachability: if very high, add a jump pad shortly before
+        if h_off >= 140:
+            jp_x = max(50, seed_x + i * 260 - 80)
+            world.add(JUMP_PAD, jp_x, GROUND_Y - 16, 40, 8)
+    # add some holes in the ground
+    for i in range(max(1, lv // 2)):
+        world.add(HOLE, 400 + i * 450, GROUND_Y, rng.randint(60, 120), 50)
+    # add some spikes on the ground
+    for i in range(max(1, lv // 2)):
+        world.add(SPIKE, 600 + i * 340, GROUND_Y - 16, 32, 16)
+    # machines placed at fractions across the world, mounted above ground to shoot down
+    positions = [int(world.width * 0.25), int(world.width * 0.5), int(world.width * 0.78)]
+    for idx, px in enumerate(positions):
+        interval = max(600, 1800 - lv * 100 + idx * 200)
+        world.add_machine(px, GROUND_Y - 220, direction=1, shoot_interval=interval)
+    # finish flag near the right end
+    world.add(FINISH, world.width - 80, GROUND_Y - 120, 40, 120)
+    # default checkpoint placement for procedural levels
+    world.add(CHECKPOINT, max(50, int(world.width * 0.2)), GROUND_Y - 40, 24, 40)
+
+
+def restart(world):
+    """Restart after game over (same level) or after the final victory (level 1)."""
+    world.final_victory = False
+    build_level(world, world.level)
+    world.player.reset()
+    world.camera_x = 0
+    world.game_over = False
+    world.win = False
+
+
+def advance_level(world):
+    """Move to the next level, or show the victory screen after the last JSON level."""
+    total_levels = level_count()
+    world.level += 1
+    # if JSON levels exist and we've finished them all, show victory
+    if total_levels > 0 and world.level > total_levels:
+        world.win = True
+        world.final_victory = True
+        world.level = 1
+        return
+    world.camera_x = 0
+    build_level(world, world.level)
+    world.player.reset()